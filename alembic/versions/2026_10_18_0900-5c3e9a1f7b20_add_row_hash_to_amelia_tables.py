@@ -0,0 +1,35 @@
+"""add row hash to amelia tables
+
+Revision ID: 5c3e9a1f7b20
+Revises: 241f52db82cd
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3e9a1f7b20'
+down_revision: Union[str, None] = '241f52db82cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+AMELIA_TABLES = [
+    'buildings', 'companies', 'facilities', 'floors', 'issues',
+    'priorities', 'rooms', 'services', 'statuses', 'statuses_history',
+    'tech_passports', 'users', 'work_categories', 'workflows'
+]
+
+
+def upgrade() -> None:
+    for table in AMELIA_TABLES:
+        op.add_column(table, sa.Column('row_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    for table in AMELIA_TABLES:
+        op.drop_column(table, 'row_hash')
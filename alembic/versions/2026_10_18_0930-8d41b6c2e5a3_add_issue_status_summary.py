@@ -0,0 +1,62 @@
+"""add issue status summary
+
+Revision ID: 8d41b6c2e5a3
+Revises: 5c3e9a1f7b20
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41b6c2e5a3'
+down_revision: Union[str, None] = '5c3e9a1f7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('issue_status_summary',
+    sa.Column('issue_id', sa.Integer(), nullable=False),
+    sa.Column('last_status_id', sa.Integer(), nullable=False),
+    sa.Column('last_status', sa.String(length=350), nullable=False),
+    sa.Column('last_status_created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('pred_status', sa.String(length=350), nullable=True),
+    sa.Column('pred_status_created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('first_status_created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('transitions_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['issue_id'], ['issues.external_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('issue_id')
+    )
+    op.execute("""
+        insert into issue_status_summary (
+            issue_id, last_status_id, last_status, last_status_created_at,
+            pred_status, pred_status_created_at, first_status_created_at, transitions_count
+        )
+        select
+            issue_id,
+            max(external_id) filter (where rn = 1),
+            max(status) filter (where rn = 1),
+            max(created_at) filter (where rn = 1),
+            max(status) filter (where rn = 2),
+            max(created_at) filter (where rn = 2),
+            min(created_at),
+            count(*)
+        from (
+            select
+                issue_id,
+                external_id,
+                status,
+                created_at,
+                row_number() over (partition by issue_id order by external_id desc) as rn
+            from statuses_history
+        ) ranked
+        group by issue_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('issue_status_summary')
@@ -0,0 +1,54 @@
+"""add hot path indexes
+
+Revision ID: a7e2c94d1b86
+Revises: 8d41b6c2e5a3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c94d1b86'
+down_revision: Union[str, None] = '8d41b6c2e5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    # latest / previous status per issue (issue_status_summary refresh)
+    ('ix_statuses_history_issue_id_external_id', 'statuses_history', ['issue_id', sa.text('external_id DESC')], ['status', 'created_at']),
+    # status transitions of an issue in a time range
+    ('ix_statuses_history_issue_id_created_at', 'statuses_history', ['issue_id', 'created_at'], ['status']),
+    ('ix_issues_created_at', 'issues', ['created_at'], []),
+    ('ix_issues_service_id_created_at', 'issues', ['service_id', 'created_at'], []),
+    ('ix_issues_facility_id_created_at', 'issues', ['facility_id', 'created_at'], []),
+    ('ix_issues_building_id', 'issues', ['building_id'], []),
+    ('ix_issues_work_category_id', 'issues', ['work_category_id'], []),
+    ('ix_issue_status_summary_first_status_created_at', 'issue_status_summary', ['first_status_created_at'], []),
+    ('ix_issue_status_summary_last_status', 'issue_status_summary', ['last_status'], []),
+]
+
+
+def upgrade() -> None:
+    # concurrently, so the sync tasks are not blocked on the big tables
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_include=include,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+    op.execute('ANALYZE statuses_history')
+    op.execute('ANALYZE issues')
+    op.execute('ANALYZE issue_status_summary')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
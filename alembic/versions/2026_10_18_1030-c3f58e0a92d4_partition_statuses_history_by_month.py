@@ -0,0 +1,140 @@
+"""partition statuses history by month
+
+Revision ID: c3f58e0a92d4
+Revises: a7e2c94d1b86
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f58e0a92d4'
+down_revision: Union[str, None] = 'a7e2c94d1b86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = 'id, created_at, updated_at, external_id, row_hash, issue_id, message, percentage, status, "user"'
+PARTITIONS_AHEAD = 3
+
+
+def next_month(month_start: date) -> date:
+    return date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+
+
+def drop_constraints_and_indexes(table: str) -> None:
+    """
+    Index names are global, free them for the new table
+    """
+    op.execute(f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN SELECT conname FROM pg_constraint WHERE conrelid = '{table}'::regclass LOOP
+                EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', r.conname);
+            END LOOP;
+            FOR r IN SELECT indexname FROM pg_indexes WHERE tablename = '{table}' LOOP
+                EXECUTE format('DROP INDEX %I', r.indexname);
+            END LOOP;
+        END $$;
+    """)
+
+
+def create_history_indexes() -> None:
+    op.create_index(
+        'ix_statuses_history_issue_id_external_id', 'statuses_history',
+        ['issue_id', sa.text('external_id DESC')],
+        postgresql_include=['status', 'created_at']
+    )
+    op.create_index(
+        'ix_statuses_history_issue_id_created_at', 'statuses_history',
+        ['issue_id', 'created_at'],
+        postgresql_include=['status']
+    )
+
+
+def upgrade() -> None:
+    op.rename_table('statuses_history', 'statuses_history_old')
+    drop_constraints_and_indexes('statuses_history_old')
+
+    op.create_table('statuses_history',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('statuses_history_id_seq'::regclass)"), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('external_id', sa.Integer(), nullable=False),
+    sa.Column('row_hash', sa.String(length=32), nullable=True),
+    sa.Column('issue_id', sa.Integer(), nullable=False),
+    sa.Column('message', sa.String(), nullable=False),
+    sa.Column('percentage', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=350), nullable=False),
+    sa.Column('user', sa.String(length=350), nullable=False),
+    sa.ForeignKeyConstraint(['issue_id'], ['issues.external_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    sa.UniqueConstraint('external_id', 'created_at', name='statuses_history_external_id_created_at_key'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.execute('CREATE TABLE statuses_history_default PARTITION OF statuses_history DEFAULT')
+
+    first_month = op.get_bind().execute(sa.text(
+        "SELECT date_trunc('month', min(created_at) AT TIME ZONE 'UTC')::date FROM statuses_history_old"
+    )).scalar()
+    today = date.today()
+    month_start = first_month or date(today.year, today.month, 1)
+    last_month = date(today.year, today.month, 1)
+    for _ in range(PARTITIONS_AHEAD):
+        last_month = next_month(last_month)
+    while month_start <= last_month:
+        month_end = next_month(month_start)
+        op.execute(
+            f"CREATE TABLE statuses_history_p{month_start:%Y_%m} PARTITION OF statuses_history "
+            f"FOR VALUES FROM ('{month_start.isoformat()} 00:00:00+00') TO ('{month_end.isoformat()} 00:00:00+00')"
+        )
+        month_start = month_end
+
+    # rows without a creation time get the time they were stored
+    op.execute(f"""
+        INSERT INTO statuses_history ({COLUMNS})
+        SELECT {COLUMNS.replace('created_at', 'coalesce(created_at, updated_at, now())')}
+        FROM statuses_history_old
+    """)
+    op.execute('ALTER SEQUENCE statuses_history_id_seq OWNED BY statuses_history.id')
+    op.drop_table('statuses_history_old')
+
+    create_history_indexes()
+    op.execute('ANALYZE statuses_history')
+
+
+def downgrade() -> None:
+    op.rename_table('statuses_history', 'statuses_history_partitioned')
+    drop_constraints_and_indexes('statuses_history_partitioned')
+
+    op.create_table('statuses_history',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('statuses_history_id_seq'::regclass)"), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('external_id', sa.Integer(), nullable=False),
+    sa.Column('row_hash', sa.String(length=32), nullable=True),
+    sa.Column('issue_id', sa.Integer(), nullable=False),
+    sa.Column('message', sa.String(), nullable=False),
+    sa.Column('percentage', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=350), nullable=False),
+    sa.Column('user', sa.String(length=350), nullable=False),
+    sa.ForeignKeyConstraint(['issue_id'], ['issues.external_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('external_id')
+    )
+    op.execute(f"""
+        INSERT INTO statuses_history ({COLUMNS})
+        SELECT DISTINCT ON (external_id) {COLUMNS}
+        FROM statuses_history_partitioned
+        ORDER BY external_id, id DESC
+    """)
+    op.execute('ALTER SEQUENCE statuses_history_id_seq OWNED BY statuses_history.id')
+    op.drop_table('statuses_history_partitioned')
+
+    create_history_indexes()
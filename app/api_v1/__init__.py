@@ -7,6 +7,7 @@ from .users.users_api import router as users_router
 
 from .permissions.permissions_api import router as permissions_router
 from .auth.auth_api import router as auth_router
+from .health.health_api import router as health_router
 
 
 http_bearer = HTTPBearer(auto_error=False)
@@ -17,4 +18,5 @@ router.include_router(router=report_router, prefix='/reports')
 router.include_router(router=issues_router, prefix='/issues')
 router.include_router(router=users_router, prefix='/users')
 router.include_router(router=permissions_router, prefix='/permissions')
-router.include_router(router=auth_router, prefix='/auth')
\ No newline at end of file
+router.include_router(router=auth_router, prefix='/auth')
+router.include_router(router=health_router, prefix='/health')
\ No newline at end of file
@@ -4,11 +4,48 @@ from fastapi import Depends
 
 from app.services.permission.system_user_service import SystemUserService
 from app.utils.redis_manager import RedisManager
-from app.utils.unit_of_work import AbstractUnitOfWork, SqlAlchemyUnitOfWork
+from app.utils.unit_of_work import AbstractUnitOfWork, ReadOnlyUnitOfWork, SqlAlchemyUnitOfWork
+from config import config
+
+def get_uow():
+    return SqlAlchemyUnitOfWork()
 
 UowDep = Annotated[
     AbstractUnitOfWork, 
-    Depends(SqlAlchemyUnitOfWork)
+    Depends(get_uow)
+]
+
+
+def get_read_only_uow():
+    return ReadOnlyUnitOfWork()
+
+ReadOnlyUowDep = Annotated[
+    AbstractUnitOfWork,
+    Depends(get_read_only_uow)
+]
+
+
+def get_issues_uow():
+    """
+    Cached issues responses are stored under the generation bumped after the primary commit,
+    so they are built from the primary, a lagging replica would pin the previous data
+    """
+    if config.ISSUES_RESPONSE_CACHE:
+        return SqlAlchemyUnitOfWork()
+    return ReadOnlyUnitOfWork()
+
+IssuesUowDep = Annotated[
+    AbstractUnitOfWork,
+    Depends(get_issues_uow)
+]
+
+
+def get_report_uow():
+    return ReadOnlyUnitOfWork("report")
+
+ReportUowDep = Annotated[
+    AbstractUnitOfWork,
+    Depends(get_report_uow)
 ]
 
 
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from app.db.db import databases, db
+
+router = APIRouter(
+    tags=['Health']
+)
+
+
+@router.get(
+    '/db_pool',
+)
+async def get_db_pool_status():
+    """
+    Checked out connections, overflow and waiting time of every pool
+    """
+    return [db.pool_status()] + [database.pool_status() for database in databases.values()]
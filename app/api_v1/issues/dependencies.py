@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Annotated
 
-from fastapi import Depends, Query
+from fastapi import Depends, HTTPException, Query
 
 from app.schemas.issue_schemas import (CreationTime, IssuesFiltersSchema,
                                        Pagination, Place, TransitionStatuses,
@@ -46,8 +46,11 @@ def  filters_dep(
     current_statuses: list[str] = Query(
         [], example=["взята в работу", "новая"], alias="currentStatuses"
     ),
+    pagination_cursor: str | None = Query(
+        None, alias="paginationCursor"
+    ),
 ):
-    return IssuesFiltersSchema(
+    filters = IssuesFiltersSchema(
          transition=TransitionStatuses(
             start_date=transition_start_date,
             end_date=transition_end_date,
@@ -68,10 +71,17 @@ def  filters_dep(
         priorities_id=priorities_id,
         pagination=Pagination(
             limit=pagination_limit,
-            offset=pagination_ofset
+            offset=pagination_ofset,
+            cursor=pagination_cursor
         ),
         current_statuses=current_statuses
     )
+    if pagination_cursor is not None:
+        try:
+            IssuesFiltersSchema.decode_cursor(filters, pagination_cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return filters
 
 FiltersDep = Annotated[
     IssuesFiltersSchema,
@@ -1,33 +1,52 @@
 
 from time import time
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 
-from app.api_v1.dependencies import RedisManagerDep, UowDep
+from app.api_v1.dependencies import IssuesUowDep, RedisManagerDep, UowDep
 from app.api_v1.issues.dependencies import FiltersDep
 from app.schemas.issue_schemas import FilteredIssuesGetSchema, IssueFilters
 from app.services.issue_service import IssueService
 from app.utils.benchmark import perfomance_timer
+from app.utils.etag import filters_etag, is_not_modified, issues_etag
 from logger import logger
 
 router = APIRouter(
     tags=['Issues']
 )
 
+
+def set_etag(response: Response, etag: str | None):
+    """
+    Clients revalidate every time and get 304 while the data is the same
+    """
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
 @perfomance_timer
 @router.get(
     '',
     response_model=FilteredIssuesGetSchema
 )
 async def get_filtered_issues(
-    uow: UowDep,
+    uow: IssuesUowDep,
     issues_filters: FiltersDep,
-    redis: RedisManagerDep
+    redis: RedisManagerDep,
+    if_none_match: str | None = Header(None)
 ):
     try:
+        etag = await issues_etag(redis, issues_filters)
+        if is_not_modified(if_none_match, etag):
+            not_modified = Response(status_code=304)
+            set_etag(not_modified, etag)
+            return not_modified
 
         issue_service = IssueService(uow, redis)
-        res = await issue_service.get_filtered_issues(issues_filters)
+        content = await issue_service.get_filtered_issues_json(issues_filters)
 
+        # response_model is kept for the docs, the body is already serialized by alias
+        res = Response(content=content, media_type="application/json")
+        set_etag(res, etag)
         return res
 
     except Exception as error:
@@ -42,11 +61,21 @@ async def get_filtered_issues(
 )
 async def get_filters(
     uow: UowDep,
-    redis: RedisManagerDep
+    redis: RedisManagerDep,
+    response: Response,
+    if_none_match: str | None = Header(None)
 ):
     try:
+        etag = await filters_etag(redis)
+        if is_not_modified(if_none_match, etag):
+            not_modified = Response(status_code=304)
+            set_etag(not_modified, etag)
+            return not_modified
+
         issue_service = IssueService(uow, redis)
         res = await issue_service.get_filter_values()
+
+        set_etag(response, etag)
         return res
 
     except Exception as error:
@@ -4,7 +4,7 @@ from uuid import uuid4
 from fastapi import APIRouter, BackgroundTasks, Request
 from fastapi.responses import FileResponse, StreamingResponse
 
-from app.api_v1.dependencies import RedisManagerDep, UowDep
+from app.api_v1.dependencies import RedisManagerDep, ReportUowDep
 from app.schemas.issue_schemas import IssuesFiltersSchema
 from app.services.report_service import ReportService
 from app.services.room_service import RoomService
@@ -29,7 +29,7 @@ async def file_streamer(file_path: str) -> AsyncGenerator[bytes, None]:
     # status_code=status.HTTP_201_CREATED
 )
 async def generate_general_report(
-    uow: UowDep,
+    uow: ReportUowDep,
     request: Request,
     response_class=FileResponse  
 ):  
@@ -47,7 +47,7 @@ async def generate_general_report(
     '/generate_general_issues_report_ver2', 
 )
 async def issues_report_ver2(
-    uow: UowDep,
+    uow: ReportUowDep,
     redis: RedisManagerDep,
     issues_filters: IssuesFiltersSchema,
     background_tasks: BackgroundTasks
@@ -70,7 +70,7 @@ async def issues_report_ver2(
     '/issue-report-file-status/{task_id}', 
 )
 async def get_report_status(
-    uow: UowDep,
+    uow: ReportUowDep,
     redis: RedisManagerDep,
     task_id:str
 ):
@@ -94,7 +94,7 @@ async def get_report_status(
     '/save-issue-report/{task_id}', 
 )
 async def save_report(
-    uow: UowDep,
+    uow: ReportUowDep,
     redis: RedisManagerDep,
     task_id:str
 ):
@@ -6,10 +6,14 @@ from typing import Any, TypedDict
 from urllib.parse import urlencode
 
 from loguru import logger
-from requests import Response, Session, post
+from requests import Response, Session
 from requests.exceptions import ConnectionError, Timeout
 
 from app.celery.helpers import ReturnTypeFromJsonQuery
+from app.utils.http_client_registry import HttpClientRegistry
+from app.utils.rate_limiter import RedisRateLimiter
+from app.utils.response_cache import ResponseCache
+from app.utils.token_cache import TokenCache
 from config import config
 
 
@@ -73,7 +77,7 @@ class AmeliaApi():
             timeout: int = 100
         ):
 
-        self.session: Session = Session()
+        self.session: Session = HttpClientRegistry.get_sync_session()
         self.base_url = base_url
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
@@ -84,21 +88,28 @@ class AmeliaApi():
             "per_page": pagination_per_page
         }
         self.timeout = timeout
+        self.token_cache = TokenCache()
+        self.token_expires_at: float = 0
+        self.global_rate_limiter = RedisRateLimiter()
+        self.response_cache = ResponseCache()
 
 
-    def get(self, route: str, params: dict[str, Any] = {}) -> Response | None:
+    def get(self, route: str, params: dict[str, Any] = {}, headers: dict[str, str] | None = None) -> Response | None:
         flag = True
         response = None
         while flag:
             try:
-                response = self.session.get(self.base_url + route, params=params, timeout=self.timeout)
+                if self.token_expires_at and not TokenCache.is_fresh(self.token_expires_at):
+                    self.auth()
+                self.global_rate_limiter.acquire()
+                response = self.session.get(self.base_url + route, params=params, headers=headers, timeout=self.timeout)
                 st_code = response.status_code 
                 
                 if st_code == 401:
                     logger.error(f"Some error: status code is {st_code}, text: {response.text}")
                     logger.error(response.json(), response.headers, sep="\n\n")
-                    sleep(20)
-                    self.auth()
+                    if self.auth(force=True, stale=self.sent_token(response)) != 0:
+                        sleep(config.API_CALLS_TIMEOUT_DELAY)
                     logger.info("Next try")
                     continue
                 elif st_code == 404:
@@ -122,19 +133,48 @@ class AmeliaApi():
                     continue
         return response    
 
+    def get_if_changed(self, route: str, params: dict[str, Any] = {}) -> tuple[Response | None, bool]:
+        """
+        Conditional get, the flag is false when the page is the same as the remembered one
+        """
+        if not config.API_RESPONSE_CACHE:
+            return self.get(route, params), True
+        url = self.cache_url(route, params)
+        response = self.get(route, params, headers=self.response_cache.conditional_headers(url))
+        if response is None:
+            return None, True
+        return response, not self.response_cache.is_unchanged(url, response.status_code, response.content)
+
+    def remember(self, route: str, params: dict[str, Any], response: Response, ids: list[int] | None = None):
+        """
+        Remember the page after it was written to the database
+        """
+        if config.API_RESPONSE_CACHE:
+            self.response_cache.store(self.cache_url(route, params), response.headers, response.content, ids)
+
+    def remembered_ids(self, route: str, params: dict[str, Any] = {}) -> list[int]:
+        return self.response_cache.ids(self.cache_url(route, params))
+
+    @staticmethod
+    def cache_url(route: str, params: dict[str, Any]) -> str:
+        return route + urlencode(params)
+
     def patch(self, route: str, params: dict[str, Any] = {}) -> Response | None:
         flag = True
         response = None
         while flag:
             try:
+                if self.token_expires_at and not TokenCache.is_fresh(self.token_expires_at):
+                    self.auth()
+                self.global_rate_limiter.acquire()
                 response = self.session.patch(self.base_url + route, json=params, timeout=self.timeout)
                 st_code = response.status_code 
                 
                 if st_code == 401:
                     logger.error(f"Some error: status code is {st_code}, text: {response.text}")
                     logger.error(response.json(), response.headers, sep="\n\n")
-                    sleep(20)
-                    self.auth()
+                    if self.auth(force=True, stale=self.sent_token(response)) != 0:
+                        sleep(config.API_CALLS_TIMEOUT_DELAY)
                     logger.info("Next try")
                     continue
                 elif st_code == 404:
@@ -312,11 +352,37 @@ class AmeliaApi():
 
         return urlencode(params)
     
-    def auth(self) -> int:
+    @staticmethod
+    def sent_token(response: Response) -> str:
+        """
+        Token the request was sent with, other requests may have refreshed it since
+        """
+        return response.request.headers.get("Authorization", "").removeprefix("Bearer ")
+
+    def auth(self, force: bool = False, stale: str | None = None) -> int:
+        """
+        Take the shared token from cache, login only when it is missing or expiring.
+        With force the stale token, the current one by default, is not reused.
+        """
+        if force and stale is None:
+            stale = self.headers["Authorization"].removeprefix("Bearer ")
+        cached = None if force else self.token_cache.get()
+        if cached is None:
+            cached = self.token_cache.refresh(self.login, stale or None)
+        if cached is None:
+            return 1
+
+        token, self.token_expires_at = cached
+        self.headers["Authorization"] = f"Bearer {token}"
+        self.session.headers.update(self.headers)
+        return 0
+
+    def login(self) -> str | None:
         flag = True
+        token = None
         while flag:
             try:
-                response = post(
+                response = self.session.post(
                     url=self.base_url+APIRoutes.LOGIN,
                     headers=self.headers,
                     json={
@@ -328,16 +394,15 @@ class AmeliaApi():
                     timeout=self.timeout
                 )
                 if response.status_code != 200:
-                    return 1
+                    return None
                 else:
                     flag = False
-                    self.headers["Authorization"] = f"Bearer {response.json()['token']}"
-                    self.session.headers.update(self.headers)
+                    token = response.json()['token']
             except Exception as e:
                 print("Some error: ", e)
                 sleep(config.API_CALLS_DELAY)
                 continue
-        return 0
+        return token
 
     def get_pagination(self) -> Pagination:
         return self.pagination
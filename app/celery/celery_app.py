@@ -1,6 +1,10 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 
+from app.db import db
+from app.utils.http_client_registry import HttpClientRegistry
+from app.utils.redis_manager import LoopPoolRegistry
 from config import config
 
 celery_app = Celery(
@@ -17,6 +21,7 @@ celery_app = Celery(
         "tasks.organizations_tasks",
 
         "tasks.cache_tasks",
+        "tasks.partitions_tasks",
     ],
     broker_connection_retry=True,
     broker_connection_retry_on_startup=True,
@@ -32,9 +37,25 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.cache_tasks.update_building_cache",
         "schedule": crontab(minute="0", hour="3"),
     },
+    "create_statuses_history_partitions": {
+        "task": "tasks.partitions_tasks.create_statuses_history_partitions",
+        "schedule": crontab(minute="0", hour="2"),
+    },
     # "patch_users": {
     #     "task": "tasks.organizations_tasks.patch_common_users",
     #     "schedule": crontab(hour='*/2', minute="0"),
     #     "kwargs": {"delay": 3, "pages": 4}
     # },
 }
+
+
+@worker_process_init.connect
+def configure_db_pool(**kwargs):
+    if db.role != "worker":
+        db.configure("worker")
+
+
+@worker_process_shutdown.connect
+def close_http_clients(**kwargs):
+    HttpClientRegistry.close_all()
+    LoopPoolRegistry.close_all()
@@ -14,6 +14,7 @@ from app.services.priority_service import PriorityService
 from app.services.service_service import ServiceService
 from app.services.user_service import UserService
 from app.services.workflow_service import WorkflowService
+from app.utils.mappers_cache import MappersCache
 from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 
 
@@ -129,6 +130,10 @@ def handle_response_of_tech_passports(response: Response, model: Type[TechPasspo
 class ServicesMappers:
     @staticmethod
     async def mappers(uow: SqlAlchemyUnitOfWork) -> dict[str, Any]:
+        return await MappersCache.get(uow, ServicesMappers.load_mappers)
+
+    @staticmethod
+    async def load_mappers(uow: SqlAlchemyUnitOfWork) -> dict[str, Any]:
         return {
             "company_title_id_mapped": await CompanyService.get_title_id_mapping(uow),
             "service_work_categories_mapped": await ServiceService.get_mapping_service_id_work_categories(uow),
@@ -19,6 +19,7 @@ async def update_building_cache():
         redis_manager: RedisManager = RedisManager()
 
         await redis_manager.set_cache(CachePrefixes.BUILDINGS_ROOMS_INFO, serialized_buildings)
+        await redis_manager.close()
       
     except Exception as er:
         logger.error(f"Some error: {er}")
@@ -1,9 +1,24 @@
+from typing import Any
+
 from loguru import logger
 from app.celery.celery_app import celery_app
 
 
 @celery_app.task
-def sync_issues_current_archive_chord_job_callback(results: list[str]) -> str:
+def sync_issues_current_archive_chord_job_callback(results: list[dict[str, Any] | None]) -> dict[str, Any]:
+    summary: dict[str, Any] = {"tasks": len(results), "pages": 0, "inserted": 0, "updated": 0, "changed": 0, "errors": []}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        summary["pages"] += result.get("pages", 0)
+        summary["inserted"] += result.get("inserted", 0)
+        summary["updated"] += result.get("updated", 0)
+        summary["changed"] += result.get("changed", 0)
+        if result.get("error"):
+            summary["errors"].append({"task": result["task"], "service_ids": result["service_ids"], "borders": result["borders"], "error": result["error"]})
+
     msg: str = "Synchronizing issues (current/archive) job completed successfully" 
-    logger.info(msg)
-    return msg
\ No newline at end of file
+    if summary["errors"]:
+        msg = f"Synchronizing issues (current/archive) job completed with {len(summary['errors'])} failed tasks"
+    logger.info(f"{msg}: {summary}")
+    return summary
@@ -16,6 +16,7 @@ from app.services.priority_service import PriorityService
 from app.services.service_service import ServiceService
 from app.services.user_service import UserService
 from app.services.workflow_service import WorkflowService
+from app.utils.mappers_cache import MappersCache
 from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 from logger import logger 
 
@@ -45,7 +46,7 @@ def run_async_task(func):
             asyncio.set_event_loop(loop)
 
         # Run the coroutine to completion
-        loop.run_until_complete(func(*args, **kwargs))
+        return loop.run_until_complete(func(*args, **kwargs))
 
         # Optional: Close the loop if it was newly created
     return wrapper
@@ -127,6 +128,10 @@ def handle_response_of_tech_passports(response: Response, model: Type[TechPasspo
 class ServicesMappers:
     @staticmethod
     async def mappers(uow: SqlAlchemyUnitOfWork) -> dict[str, Any]:
+        return await MappersCache.get(uow, ServicesMappers.load_mappers)
+
+    @staticmethod
+    async def load_mappers(uow: SqlAlchemyUnitOfWork) -> dict[str, Any]:
         return {
             "company_title_id_mapped": await CompanyService.get_title_id_mapping(uow),
             "service_work_categories_mapped": await ServiceService.get_mapping_service_id_work_categories(uow),
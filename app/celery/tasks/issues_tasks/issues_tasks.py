@@ -6,6 +6,7 @@ from typing import Any, Sequence
 
 from requests import Response
 
+from app.celery.amelia_api_async import AmeliaApiAsync
 from app.celery.amelia_api_calls import AmeliaApi, APIGrids, APIRoutes, Borders
 from app.celery.celery_app import celery_app
 from app.celery.helpers import (DynamicIssuesResponse, ReturnTypeFromJsonQuery,
@@ -29,6 +30,8 @@ from app.services.status_service import StatusService
 from app.services.user_service import UserService
 from app.services.work_category_service import WorkCategoryService
 from app.services.workflow_service import WorkflowService
+from app.utils.mappers_cache import ReferenceVersion
+from app.utils.sync_state import CHECKPOINT_DONE, SyncStateManager
 from app.utils.unit_of_work import AbstractUnitOfWork, SqlAlchemyUnitOfWork
 from config import config
 from logger import logger
@@ -52,14 +55,18 @@ async def sync_statuses():
     workflows = await workflows_service.get_all()
 
     logger.info("Companies are synchronize")
+    changed_workflows = 0
     for wf in workflows:
         wf_external_id = wf.external_id
         url = APIRoutes.statuses_for_workflows(wf_external_id)
-        response = amelia_api.get(url)
+        response, changed = amelia_api.get_if_changed(url)
         if response is None:
             msg = f"Statuses for workflow {wf_external_id} response is none"
             logger.error(msg) 
             return msg
+        if not changed:
+            continue
+        changed_workflows += 1
         
         response_data: ReturnTypePathParams[StatusPostSchema] | None = handle_response_of_path_params(response, StatusPostSchema)
         statuses = response_data.data
@@ -67,15 +74,14 @@ async def sync_statuses():
             st.workflow_id = wf.id
         
 
-        external_ids = [s.external_id for s in statuses]
-        existing_external_ids = await status_service.get_existing_external_ids(external_ids)
-        elements_to_insert = [element for element in statuses if element.external_id not in existing_external_ids]
-        element_to_update = [element for element in statuses if element.external_id in existing_external_ids]
-
-        if elements_to_insert != []:
-            await status_service.bulk_insert(elements_to_insert) 
-        if element_to_update != []:
-            await status_service.bulk_update(element_to_update) 
+        if statuses != [] and await status_service.bulk_upsert(statuses) != 0:
+            msg = f"Statuses for workflow {wf_external_id} upserting error"
+            logger.error(msg)
+            return msg
+        amelia_api.remember(url, {}, response)
+    logger.info(f"Workflows with changed statuses: {changed_workflows} of {len(workflows)}")
+    if changed_workflows != 0:
+        ReferenceVersion.bump()
     msg = "Statuses were synchronized"
     logger.info(msg) 
     return msg
@@ -107,14 +113,18 @@ async def sync_services():
     try:
         service_service = ServiceService(uow)
 
+        changed_pages = 0
         for i in range(1, pages):
             params = amelia_api.create_json_for_request(APIGrids.SERVICES, i)
-            response = amelia_api.get(APIRoutes.SERVICES_WITH_QUERY, params=params)
+            response, changed = amelia_api.get_if_changed(APIRoutes.SERVICES_WITH_QUERY, params=params)
 
             if response is None:
                 msg = "Services response is none"
                 logger.error(msg)
                 return msg
+            if not changed:
+                continue
+            changed_pages += 1
     
             response_data: ReturnTypeFromJsonQuery[ServicePostSchema] = handle_response_of_json_query(response, ServicePostSchema)
 
@@ -123,19 +133,19 @@ async def sync_services():
                 s.facility_id = facilities_name_id_mapped[s.facility_title]
                 services.append(s)
 
-            external_ids = [e.external_id for e in services]
-            existing_external_ids = await service_service.get_existing_external_ids(external_ids)
-            elements_to_insert = [element for element in services if element.external_id not in existing_external_ids]
-            element_to_update = [element for element in services if element.external_id in existing_external_ids]
-            if elements_to_insert != []:
-                await service_service.bulk_insert(elements_to_insert) 
-            if element_to_update != []:
-                await service_service.bulk_update(element_to_update) 
+            if services != [] and await service_service.bulk_upsert(services) != 0:
+                msg = "Services upserting error"
+                logger.error(msg)
+                return msg
+            amelia_api.remember(APIRoutes.SERVICES_WITH_QUERY, params, response)
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
     
+    logger.info(f"Services pages with changes: {changed_pages} of {pages - 1}")
+    if changed_pages != 0:
+        ReferenceVersion.bump()
     logger.info("Services were synchronized")
     return
 
@@ -167,14 +177,18 @@ async def sync_work_categories():
     try:
         work_category_service = WorkCategoryService(uow)
 
+        changed_pages = 0
         for i in range(1, pages):
             params = amelia_api.create_json_for_request(APIGrids.WORK_CATEGORIES, i)
-            response = amelia_api.get(APIRoutes.WORK_CATEGORIES_WITH_QUERY, params=params)
+            response, changed = amelia_api.get_if_changed(APIRoutes.WORK_CATEGORIES_WITH_QUERY, params=params)
 
             if response is None:
                 msg = "Work categories response is none"
                 logger.error(msg)
                 return msg
+            if not changed:
+                continue
+            changed_pages += 1
     
             response_data: ReturnTypeFromJsonQuery[WorkCategoryPostSchema] = handle_response_of_json_query(response, WorkCategoryPostSchema)
 
@@ -184,25 +198,25 @@ async def sync_work_categories():
                 wc.service_id = services_name_id_mapped[wc.service_title]
                 work_categories.append(wc)
 
-            external_ids = [e.external_id for e in work_categories]
-            existing_external_ids = await work_category_service.get_existing_external_ids(external_ids)
-            elements_to_insert = [element for element in work_categories if element.external_id not in existing_external_ids]
-            element_to_update = [element for element in work_categories if element.external_id in existing_external_ids]
-            if elements_to_insert != []:
-                await work_category_service.bulk_insert(elements_to_insert) 
-            if element_to_update != []:
-                await work_category_service.bulk_update(element_to_update) 
+            if work_categories != [] and await work_category_service.bulk_upsert(work_categories) != 0:
+                msg = "Work categories upserting error"
+                logger.error(msg)
+                return msg
+            amelia_api.remember(APIRoutes.WORK_CATEGORIES_WITH_QUERY, params, response)
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
     
+    logger.info(f"Work categories pages with changes: {changed_pages} of {pages - 1}")
+    if changed_pages != 0:
+        ReferenceVersion.bump()
     logger.info("Services were synchronized")
     return
 
 @celery_app.task
 @run_async_task
-async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None, included_statuses: list[str] | None = None):
+async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None, included_statuses: list[str] | None = None, resume: bool = True):
     """
     Get archive
     """
@@ -212,17 +226,15 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
     amelia_api: AmeliaApi = AmeliaApi()
     amelia_api.auth()
 
-    company_title_id_mapped: dict[str, int] = await CompanyService.get_title_id_mapping(uow)
-    service_work_categories_mapped: dict[int, dict[str, int]] = await ServiceService.get_mapping_service_id_work_categories(uow)
-    building_title_id_mapped: dict[str, int] = await BuildingService.get_title_id_mapping(uow)
-    priority_title_id_mapped: dict[str, int] = await PriorityService.get_title_id_mapping(uow)
-    exucutor_fullname_id_mapped: dict[str, int] = await UserService.get_fullname_id_mapping_by_roles(
-        uow, 
-        ["admin", "director", "chief_engineer", "dispatcher", "executor", "dispatcher/executor"]
-    )
-    building_rooms_mapping: dict[str, dict[str, int]] = await BuildingService.get_building_rooms_mapping(uow)
-    workflow_extenal_id_id_mapping: dict[int, int] = await WorkflowService.get_external_id_id_mapping(uow)
-    users_ids: set[int] = await UserService.get_users_ids(uow)
+    mappers: dict[str, Any] = await ServicesMappers.mappers(uow)
+    company_title_id_mapped: dict[str, int] = mappers["company_title_id_mapped"]
+    service_work_categories_mapped: dict[int, dict[str, int]] = mappers["service_work_categories_mapped"]
+    building_title_id_mapped: dict[str, int] = mappers["building_title_id_mapped"]
+    priority_title_id_mapped: dict[str, int] = mappers["priority_title_id_mapped"]
+    exucutor_fullname_id_mapped: dict[str, int] = mappers["executor_fullname_id_mapped"]
+    building_rooms_mapping: dict[str, dict[str, int]] = mappers["building_rooms_mapping"]
+    workflow_extenal_id_id_mapping: dict[int, int] = mappers["workflow_external_id_id_mapping"]
+    users_ids: set[int] = mappers["users_ids"]
     
     if not included_statuses:
         included_statuses = ["отказано", "исполнена", "закрыта", "входящая", "новая", "принята", "взята в работу", "изменить исполнителя", "приостановлена", "возобновлена", "на корректировку"]
@@ -236,10 +248,19 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
 
     all_external_ids_issues_set: set[int] = set(await IssueService.get_all_external_ids(uow))
 
+    stats: dict[str, Any] = {"task": "sync_archive", "service_ids": service_ids, "borders": borders, "pages": 0, "inserted": 0, "updated": 0, "changed": 0, "error": None}
     logger.info("Archive issues are synchronize")
     try:
         issue_service = IssueService(uow)
+        sync_state = SyncStateManager()
+        if not resume:
+            await sync_state.reset_checkpoints("sync_archive", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
         for service_id in service_ids: 
+            checkpoint = await sync_state.get_checkpoint("sync_archive", service_id, borders)
+            if checkpoint == CHECKPOINT_DONE:
+                logger.info(f"Service {service_id} is already synchronized, skip")
+                continue
+
             issues_for_inserting: list[IssuePostSchema] = []
             issues_for_updating: list[IssuePostSchema] = []
             issue_id_for_status_sinchronize: list[int] = []
@@ -259,6 +280,10 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
                 start_page = borders["start"]
                 end_page = borders["end"]
 
+            if checkpoint is not None:
+                start_page = checkpoint + 1
+                logger.info(f"Resume service {service_id} from page {start_page}")
+
             all_issues_with_statuses: dict[int, str] = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
 
             for i in range(start_page, end_page):
@@ -271,9 +296,11 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
                 if response is None:
                     msg = "Current issues response is none"
                     logger.error(msg)
-                    return msg
+                    stats["error"] = msg
+                    return stats
         
                 response_data: ReturnTypeFromJsonQuery[IssuePostSchema] = handle_response_of_json_query(response, IssuePostSchema)
+                stats["pages"] += 1
 
                 for iss in response_data.data:
                     current_issues_status = all_issues_with_statuses.get(iss.external_id, None)
@@ -316,12 +343,10 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
 
                 if i % 10 == 0:
                     
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting) 
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize) 
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay, stats, bulk_load=True)
+                    if error is not None:
+                        stats["error"] = error
+                        return stats
 
                     issue_id_for_status_sinchronize = []
                     issues_for_updating = []
@@ -330,33 +355,35 @@ async def sync_archive(delay: float = config.API_CALLS_DELAY, service_external_i
                     all_issues_with_statuses = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
                     all_external_ids_issues_set_by_service = set([*all_issues_with_statuses])
                     logger.info(f"Page: {i}, service: {service_id}")
+                    await sync_state.save_checkpoint("sync_archive", service_id, i, borders)
 
                 elif i == end_page - 1:
 
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting)
-                        issues_for_inserting = []
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                        issues_for_updating = []
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize, delay)
-                        issue_id_for_status_sinchronize = []
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay, stats, bulk_load=True)
+                    if error is not None:
+                        stats["error"] = error
+                        return stats
+                    issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize = [], [], []
 
                     logger.info(f"Page: {i}, service: {service_id}, end")
 
                     end_page = 0
+
+            await sync_state.save_checkpoint("sync_archive", service_id, CHECKPOINT_DONE, borders)
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
-        return e
+        stats["error"] = str(e)
+        return stats
     
+    await SyncStateManager().reset_checkpoints("sync_archive", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
+
     return_msg = "Archive issues were synchronized"
     logger.info(return_msg)
-    return return_msg
+    return stats
 
 @celery_app.task
 @run_async_task
-async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None):
+async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None, resume: bool = True):
     """
     Get current issues
     """
@@ -367,17 +394,15 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
     amelia_api.auth()
 
     
-    company_title_id_mapped: dict[str, int] = await CompanyService.get_title_id_mapping(uow)
-    service_work_categories_mapped: dict[int, dict[str, int]] = await ServiceService.get_mapping_service_id_work_categories(uow)
-    building_title_id_mapped: dict[str, int] = await BuildingService.get_title_id_mapping(uow)
-    priority_title_id_mapped: dict[str, int] = await PriorityService.get_title_id_mapping(uow)
-    exucutor_fullname_id_mapped: dict[str, int] = await UserService.get_fullname_id_mapping_by_roles(
-        uow, 
-        ["admin", "director", "chief_engineer", "dispatcher", "executor", "dispatcher/executor"]
-    )
-    building_rooms_mapping: dict[str, dict[str, int]] = await BuildingService.get_building_rooms_mapping(uow)
-    workflow_extenal_id_id_mapping: dict[int, int] = await WorkflowService.get_external_id_id_mapping(uow)
-    users_ids: set[int] = await UserService.get_users_ids(uow)
+    mappers: dict[str, Any] = await ServicesMappers.mappers(uow)
+    company_title_id_mapped: dict[str, int] = mappers["company_title_id_mapped"]
+    service_work_categories_mapped: dict[int, dict[str, int]] = mappers["service_work_categories_mapped"]
+    building_title_id_mapped: dict[str, int] = mappers["building_title_id_mapped"]
+    priority_title_id_mapped: dict[str, int] = mappers["priority_title_id_mapped"]
+    exucutor_fullname_id_mapped: dict[str, int] = mappers["executor_fullname_id_mapped"]
+    building_rooms_mapping: dict[str, dict[str, int]] = mappers["building_rooms_mapping"]
+    workflow_extenal_id_id_mapping: dict[int, int] = mappers["workflow_external_id_id_mapping"]
+    users_ids: set[int] = mappers["users_ids"]
 
 
     included_statuses = ["отказано", "исполнена", "закрыта", "входящая", "новая", "принята", "взята в работу", "изменить исполнителя", "приостановлена", "возобновлена", "на корректировку"]
@@ -388,14 +413,28 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
         service_ids.remove(21)
     else:
         service_ids = service_external_ids
+    stats: dict[str, Any] = {"task": "sync_current_issues", "service_ids": service_ids, "borders": borders, "pages": 0, "inserted": 0, "updated": 0, "changed": 0, "error": None}
     logger.info("Current issues are synchronize")
 
     all_external_ids_issues_set: set[int] = set(await IssueService.get_all_external_ids(uow))
     all_issues_for_definding_archive_sync: dict[int, str] =  await HistoryStatusService.get_external_issues_id_with_status_title(uow, filter_statuses=in_porgress_statuses)
     try:
         issue_service = IssueService(uow)
+        sync_state = SyncStateManager()
+        if not resume:
+            await sync_state.reset_checkpoints("sync_current_issues", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
+        # issues already handled by the interrupted run are not handed off to the archive sync again
+        for service_id in service_ids:
+            for iss_id in await sync_state.get_handed_off_ids("sync_current_issues", service_id, borders):
+                all_issues_for_definding_archive_sync.pop(iss_id, None)
+        handled_ids: list[int] = []
         
         for service_id in service_ids:
+            checkpoint = await sync_state.get_checkpoint("sync_current_issues", service_id, borders)
+            if checkpoint == CHECKPOINT_DONE:
+                logger.info(f"Service {service_id} is already synchronized, skip")
+                continue
+
             issues_for_inserting: list[IssuePostSchema] = []
             issues_for_updating: list[IssuePostSchema] = []
             issue_id_for_status_sinchronize: list[int] = []
@@ -415,6 +454,10 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
                 start_page = borders["start"]
                 end_page = borders["end"]
 
+            if checkpoint is not None:
+                start_page = checkpoint + 1
+                logger.info(f"Resume service {service_id} from page {start_page}")
+
             all_issues_with_statuses: dict[int, str] = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
 
             for i in range(start_page, end_page):
@@ -427,9 +470,11 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
                 if response is None:
                     msg = "Current issues response is none"
                     logger.error(msg)
-                    return msg
+                    stats["error"] = msg
+                    return stats
         
                 response_data: ReturnTypeFromJsonQuery[IssuePostSchema] = handle_response_of_json_query(response, IssuePostSchema)
+                stats["pages"] += 1
 
                 for iss in response_data.data:
                     current_issues_status = all_issues_with_statuses.get(iss.external_id, None)
@@ -472,6 +517,7 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
                                 issue_id_for_status_sinchronize.append(iss.external_id)
                             else:
                                 all_issues_for_definding_archive_sync.pop(iss.external_id)
+                                handled_ids.append(iss.external_id)
                                 issues_for_updating.append(iss)
                         case (_, _, False):
                             issues_for_updating.append(iss)
@@ -480,12 +526,10 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
 
                 if i % 10 == 0:
                     
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting) 
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize, delay) 
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay, stats)
+                    if error is not None:
+                        stats["error"] = error
+                        return stats
 
                     issue_id_for_status_sinchronize = []
                     issues_for_updating = []
@@ -494,42 +538,44 @@ async def sync_current_issues(delay: float = config.API_CALLS_DELAY, service_ext
                     all_issues_with_statuses = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
                     # all_external_ids_issues_set_by_service = set([*all_issues_with_statuses])
                     logger.info(f"Page: {i}, service: {service_id}")
+                    await sync_state.save_checkpoint("sync_current_issues", service_id, i, borders, handled_ids)
+                    handled_ids = []
 
                 elif i == end_page - 1:
 
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting)
-                        issues_for_inserting = []
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                        issues_for_updating = []
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize, delay)
-
-                        issue_id_for_status_sinchronize = []
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay, stats)
+                    if error is not None:
+                        stats["error"] = error
+                        return stats
+                    issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize = [], [], []
 
                     logger.info(f"Page: {i}, service: {service_id}, end")
 
                     end_page = 0
 
+            await sync_state.save_checkpoint("sync_current_issues", service_id, CHECKPOINT_DONE, borders, handled_ids)
+            handled_ids = []
+
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
-        return e
+        stats["error"] = str(e)
+        return stats
     
-    try:
-        await sync_archive_statuses([*all_issues_for_definding_archive_sync], delay) 
-    except Exception as e:
-        logger.exception(f"Some error occurred: {e}")
-        return e
+    error = await sync_archive_statuses([*all_issues_for_definding_archive_sync], delay)
+    if error is not None:
+        stats["error"] = f"History statuses were not synchronized: {error}"
+        return stats
     
+    await SyncStateManager().reset_checkpoints("sync_current_issues", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
+
     return_msg = "Current issues were synchronized"
     logger.info(return_msg)
-    return return_msg
+    return stats
 
 @celery_app.task
 @run_async_task
-async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None, included_statuses: list[str] | None = None):
+async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service_external_ids: list[int] = [], borders: Borders | None = None, included_statuses: list[str] | None = None, resume: bool = True):
     """
     Get archive
     """
@@ -539,17 +585,15 @@ async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service
     amelia_api: AmeliaApi = AmeliaApi()
     amelia_api.auth()
 
-    company_title_id_mapped: dict[str, int] = await CompanyService.get_title_id_mapping(uow)
-    service_work_categories_mapped: dict[int, dict[str, int]] = await ServiceService.get_mapping_service_id_work_categories(uow)
-    building_title_id_mapped: dict[str, int] = await BuildingService.get_title_id_mapping(uow)
-    priority_title_id_mapped: dict[str, int] = await PriorityService.get_title_id_mapping(uow)
-    exucutor_fullname_id_mapped: dict[str, int] = await UserService.get_fullname_id_mapping_by_roles(
-        uow, 
-        ["admin", "director", "chief_engineer", "dispatcher", "executor", "dispatcher/executor"]
-    )
-    building_rooms_mapping: dict[str, dict[str, int]] = await BuildingService.get_building_rooms_mapping(uow)
-    workflow_extenal_id_id_mapping: dict[int, int] = await WorkflowService.get_external_id_id_mapping(uow)
-    users_ids: set[int] = await UserService.get_users_ids(uow)
+    mappers: dict[str, Any] = await ServicesMappers.mappers(uow)
+    company_title_id_mapped: dict[str, int] = mappers["company_title_id_mapped"]
+    service_work_categories_mapped: dict[int, dict[str, int]] = mappers["service_work_categories_mapped"]
+    building_title_id_mapped: dict[str, int] = mappers["building_title_id_mapped"]
+    priority_title_id_mapped: dict[str, int] = mappers["priority_title_id_mapped"]
+    exucutor_fullname_id_mapped: dict[str, int] = mappers["executor_fullname_id_mapped"]
+    building_rooms_mapping: dict[str, dict[str, int]] = mappers["building_rooms_mapping"]
+    workflow_extenal_id_id_mapping: dict[int, int] = mappers["workflow_external_id_id_mapping"]
+    users_ids: set[int] = mappers["users_ids"]
     
     if not included_statuses:
         included_statuses = ["отказано", "исполнена", "закрыта", "входящая", "новая", "принята", "взята в работу", "изменить исполнителя", "приостановлена", "возобновлена", "на корректировку"]
@@ -566,7 +610,15 @@ async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service
     logger.info("Archive issues are synchronize")
     try:
         issue_service = IssueService(uow)
+        sync_state = SyncStateManager()
+        if not resume:
+            await sync_state.reset_checkpoints("sync_archive_by_pattern", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
         for service_id in service_ids: 
+            checkpoint = await sync_state.get_checkpoint("sync_archive_by_pattern", service_id, borders)
+            if checkpoint == CHECKPOINT_DONE:
+                logger.info(f"Service {service_id} is already synchronized, skip")
+                continue
+
             issues_for_inserting: list[IssuePostSchema] = []
             issues_for_updating: list[IssuePostSchema] = []
             issue_id_for_status_sinchronize: list[int] = []
@@ -586,6 +638,10 @@ async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service
                 start_page = borders["start"]
                 end_page = borders["end"]
 
+            if checkpoint is not None:
+                start_page = checkpoint + 1
+                logger.info(f"Resume service {service_id} from page {start_page}")
+
             all_issues_with_statuses: dict[int, str] = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
 
             for i in range(start_page, end_page):
@@ -642,12 +698,9 @@ async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service
 
                 if i % 10 == 0:
                     
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting) 
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize) 
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay)
+                    if error is not None:
+                        return error
 
                     issue_id_for_status_sinchronize = []
                     issues_for_updating = []
@@ -656,38 +709,88 @@ async def sync_archive_by_pattern(delay: float = config.API_CALLS_DELAY, service
                     all_issues_with_statuses = await HistoryStatusService.get_external_issues_id_with_status_title(uow, service_id, included_statuses)
                     all_external_ids_issues_set_by_service = set([*all_issues_with_statuses])
                     logger.info(f"Page: {i}, service: {service_id}")
+                    await sync_state.save_checkpoint("sync_archive_by_pattern", service_id, i, borders)
 
                 elif i == end_page - 1:
 
-                    if issues_for_inserting != []:
-                        await issue_service.bulk_insert(issues_for_inserting)
-                        issues_for_inserting = []
-                    if issues_for_updating != []:
-                        await issue_service.bulk_update(issues_for_updating)
-                        issues_for_updating = []
-                    if issue_id_for_status_sinchronize != []:
-                        await sync_archive_statuses(issue_id_for_status_sinchronize, delay)
-                        issue_id_for_status_sinchronize = []
+                    error = await write_synced_pages(issue_service, issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize, delay)
+                    if error is not None:
+                        return error
+                    issues_for_inserting, issues_for_updating, issue_id_for_status_sinchronize = [], [], []
 
                     logger.info(f"Page: {i}, service: {service_id}, end")
 
                     end_page = 0
+
+            await sync_state.save_checkpoint("sync_archive_by_pattern", service_id, CHECKPOINT_DONE, borders)
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
     
+    await SyncStateManager().reset_checkpoints("sync_archive_by_pattern", [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_ids])
+
     return_msg = "Archive issues were synchronized"
     logger.info(return_msg)
     return return_msg
 
+@celery_app.task
+@run_async_task
+async def show_sync_checkpoints(task_name: str = "sync_archive"):
+    """
+    Log saved pages of sync_archive, sync_current_issues or sync_archive_by_pattern
+    """
+    checkpoints = await SyncStateManager().get_checkpoints(task_name)
+    logger.info(f"Checkpoints of {task_name}: {checkpoints}")
+
+@celery_app.task
+@run_async_task
+async def reset_sync_checkpoints(task_name: str = "sync_archive", service_external_ids: list[int] | None = None, borders: Borders | None = None):
+    """
+    Reset saved pages, the next run starts services from the first page
+    """
+    fields = None
+    if service_external_ids is not None:
+        fields = [SyncStateManager.checkpoint_field(service_id, borders) for service_id in service_external_ids]
+    await SyncStateManager().reset_checkpoints(task_name, fields)
+    logger.info(f"Checkpoints of {task_name} were reset: {fields or 'all'}")
+
+async def write_synced_pages(
+    issue_service: IssueService,
+    issues_for_inserting: list[IssuePostSchema],
+    issues_for_updating: list[IssuePostSchema],
+    issue_ids_for_statuses: list[int],
+    delay: float = config.API_CALLS_DELAY,
+    stats: dict[str, Any] | None = None,
+    bulk_load: bool = False
+) -> str | None:
+    """
+    Write issues and history statuses of the pages since the last checkpoint.
+    Returns an error message, the checkpoint must not be saved then, so a resumed run repeats the pages
+    """
+    issues = issues_for_inserting + issues_for_updating
+    if issues != []:
+        write = issue_service.bulk_load if bulk_load else issue_service.bulk_upsert
+        if await write(issues, stats) != 0:
+            msg = f"Issues between {issues[0].external_id}-{issues[-1].external_id} were not written"
+            logger.error(msg)
+            return msg
+        if stats is not None:
+            stats["inserted"] += len(issues_for_inserting)
+            stats["updated"] += len(issues_for_updating)
+
+    if issue_ids_for_statuses != []:
+        error = await sync_archive_statuses(issue_ids_for_statuses, delay)
+        if error is not None:
+            msg = f"History statuses were not synchronized: {error}"
+            logger.error(msg)
+            return msg
+    return None
+
 async def insert_history_statuses(statuses: list[HistoryStatusRecord], uow: AbstractUnitOfWork):
     history_status_service = HistoryStatusService(uow)
 
-    external_ids = [e.external_id for e in statuses]
-    statuses_existing_external_ids = await history_status_service.get_existing_external_ids(external_ids)
-    elements_to_insert = [element for element in statuses if element.external_id not in statuses_existing_external_ids]
-    if elements_to_insert != []:
-        await history_status_service.bulk_insert(elements_to_insert)
+    if statuses != []:
+        await history_status_service.bulk_load(statuses)
 
 
 async def sync_archive_statuses(existing_issues_external_ids: Sequence[int] | None = None, delay: float = config.API_CALLS_DELAY):
@@ -697,8 +800,8 @@ async def sync_archive_statuses(existing_issues_external_ids: Sequence[int] | No
 
     uow = SqlAlchemyUnitOfWork()
 
-    amelia_api: AmeliaApi = AmeliaApi()
-    amelia_api.auth()
+    amelia_api: AmeliaApiAsync = AmeliaApiAsync()
+    await amelia_api.auth()
 
     issues_service = IssueService(uow)
 
@@ -707,41 +810,42 @@ async def sync_archive_statuses(existing_issues_external_ids: Sequence[int] | No
 
     logger.info("Issues statuses are synchronize")
     try:
-        issues_ids_for_removing = []
+        issues_with_statuses: set[int] = set()
+        issues_without_statuses: set[int] = set()
         statuses: list[HistoryStatusRecord] = []
         len_existing_issues_external_ids = len(existing_issues_external_ids)
-        for i in range(0, len_existing_issues_external_ids):
-            
-            ext_issue_id = existing_issues_external_ids[i]
-            params = amelia_api.create_json_for_request(APIGrids.ISSUES_STATUSES, 1, issue_id=ext_issue_id)
-            response = amelia_api.get(APIRoutes.ISSUES_STATUSES_WITH_QUERY, params=params)
-            await sleep(delay)
-
-            if response is None:
-                msg = "Issues history statuses response is none"
-                logger.error(msg)
-                return msg
-            response_statuses_data: ReturnTypeFromJsonQuery[HistoryStatusRecord] = handle_response_of_json_query(response, HistoryStatusRecord)
-            
-            if response_statuses_data.data == []:
-                issues_ids_for_removing.append(ext_issue_id)
+        issues_with_failed_history: set[int] = set()
+        async for ext_issue_id, records in amelia_api.iter_history_statuses(existing_issues_external_ids, HistoryStatusRecord):
+            if records is None:
+                # neither written nor removed, the next sync takes it again
+                issues_with_failed_history.add(ext_issue_id)
+                continue
+            if records == []:
+                issues_without_statuses.add(ext_issue_id)
                 continue
 
-            for resp_status in response_statuses_data.data:
+            issues_with_statuses.add(ext_issue_id)
+            for resp_status in records:
                 resp_status.issue_id = ext_issue_id
                 statuses.append(resp_status)
 
-            if i % 50 == 0 and i != 0:
+            if len(statuses) >= config.DB_BULK_LOAD_BATCH_SIZE:
                 await insert_history_statuses(statuses, uow)
-                logger.info(f"Issues statuses: {i}")
+                logger.info(f"Issues statuses: {len(issues_with_statuses)}")
                 statuses = []
 
-        if statuses != []:
-            await insert_history_statuses(statuses, uow)
-        if issues_ids_for_removing != []:
-            await issues_service.bulk_delete(issues_ids_for_removing)
+        issues_ids_for_removing = list(issues_without_statuses - issues_with_statuses)
+        # last statuses and removing of issues without statuses in one transaction
+        async with uow:
+            if (
+                (statuses == [] or await HistoryStatusService(uow).bulk_load(statuses) == 0)
+                and (issues_ids_for_removing == [] or await issues_service.bulk_delete(issues_ids_for_removing) == 0)
+            ):
+                await uow.commit()
 
         logger.info(f"Issues statuses: {len_existing_issues_external_ids}")   
+        if issues_with_failed_history != set():
+            logger.error(f"History statuses of {len(issues_with_failed_history)} issues were not fetched: {sorted(issues_with_failed_history)}")
               
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
@@ -754,42 +858,32 @@ async def sync_archive_statuses(existing_issues_external_ids: Sequence[int] | No
 
 
 
-async def sync_history_statuses(issue_ids: list[int], delay: float = config.API_CALLS_DELAY) -> list[HistoryStatusRecord]:
+async def sync_history_statuses(issue_ids: list[int], delay: float = config.API_CALLS_DELAY) -> tuple[list[HistoryStatusRecord], list[int]]:
+    """
+    New history statuses and ids of issues whose history was not fetched.
+    Errors are raised, so a failure is never taken for "no new statuses"
+    """
     uow = SqlAlchemyUnitOfWork()
 
-    amelia_api: AmeliaApi = AmeliaApi()
-    amelia_api.auth()
+    amelia_api: AmeliaApiAsync = AmeliaApiAsync()
+    await amelia_api.auth()
 
     history_status_service = HistoryStatusService(uow)
 
     statuses: list[HistoryStatusRecord] = []
-    try:
-        for iss_id in issue_ids:
-            page = 1
-            while True:
-                params = amelia_api.create_json_for_request(APIGrids.ISSUES_STATUSES, page, issue_id=iss_id)
-                response = amelia_api.get(APIRoutes.ISSUES_STATUSES_WITH_QUERY, params=params)
-            
-                if response is None:
-                    logger.info("Issues history statuses response is none")
-                    return []
-                response_statuses_data: ReturnTypeFromJsonQuery[HistoryStatusRecord] = handle_response_of_json_query(response, HistoryStatusRecord)
-                response_len = len(response_statuses_data.data)
-                for resp_status in response_statuses_data.data:
-                    resp_status.issue_id = iss_id
-                    statuses.append(resp_status)
-                await sleep(delay)
-                if response_len < 20:
-                    break
-                page += 1
-        external_ids = [e.external_id for e in statuses]
-        statuses_existing_external_ids = await history_status_service.get_existing_external_ids(external_ids)
-        elements_to_insert = [element for element in statuses if element.external_id not in statuses_existing_external_ids]
-
-    except Exception as e:
-        logger.exception(f"Some error occurred: {e}")
-        return []
-    return elements_to_insert
+    failed_issue_ids: list[int] = []
+    async for iss_id, records in amelia_api.iter_history_statuses(issue_ids, HistoryStatusRecord):
+        if records is None:
+            logger.error(f"History statuses of issue {iss_id} were not fetched")
+            failed_issue_ids.append(iss_id)
+            continue
+        for resp_status in records:
+            resp_status.issue_id = iss_id
+            statuses.append(resp_status)
+    external_ids = [e.external_id for e in statuses]
+    statuses_existing_external_ids = await history_status_service.get_existing_external_ids(external_ids)
+    elements_to_insert = [element for element in statuses if element.external_id not in statuses_existing_external_ids]
+    return elements_to_insert, failed_issue_ids
 
 async def map_issue(iss: IssuePostSchema, mappers: dict) -> IssuePostSchema:
     building_title = iss.building_title.split("/")[0][:-1]
@@ -836,7 +930,8 @@ async def sync_new_issues(issues_id: list[int], delay: float = config.API_CALLS_
 
 
 
-    statuses = await sync_history_statuses(issues_id)
+    statuses, failed_issue_ids = await sync_history_statuses(issues_id)
+    issues_for_inserting = [iss for iss in issues_for_inserting if iss.external_id not in failed_issue_ids]
     if issues_for_inserting != [] and statuses != []:
         await issue_service.bulk_insert_new_issues_with_statuses(issues_for_inserting, statuses)
 
@@ -861,7 +956,8 @@ async def sync_existed_issues(issues_id: list[int], delay: float = config.API_CA
         await sleep(delay) 
 
 
-    statuses = await sync_history_statuses(issues_id)
+    statuses, failed_issue_ids = await sync_history_statuses(issues_id)
+    issues_for_updating = [iss for iss in issues_for_updating if iss.external_id not in failed_issue_ids]
     if issues_for_updating != []:
         await issue_service.bulk_update_issues_with_statuses(issues_for_updating, statuses)
 
@@ -3,10 +3,15 @@ from typing import cast
 
 from celery import chord
 from loguru import logger
-from app.celery.amelia_api_calls import Borders
+from app.celery.amelia_api_calls import AmeliaApi, APIGrids, APIRoutes, Borders
 from app.celery.celery_app import celery_app
+from app.celery.helpers import handle_response_of_json_query
 from app.celery.tasks.issues_tasks.callback import sync_issues_current_archive_chord_job_callback
+from app.celery.tasks.issues_tasks.helpers import run_async_task
 from app.celery.tasks.issues_tasks.issues_tasks import sync_archive, sync_current_issues
+from app.schemas.issue_schemas import IssuePostSchema
+from app.services.service_service import ServiceService
+from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 from config import config
 
 @celery_app.task
@@ -22,4 +27,53 @@ def sync_issues_current_archive_chord_job(service_external_ids: list[int] = [],
         ])
         result = job(callback.s())
     except Exception as e:
-        return f"Failed to enqueue tasks: {e}"
\ No newline at end of file
+        return f"Failed to enqueue tasks: {e}"
+
+
+@celery_app.task
+@run_async_task
+async def sync_issues_fan_out_job(service_external_ids: list[int] = [], delay: float = config.API_CALLS_DELAY, pages_per_task: int = config.SYNC_PAGES_PER_TASK, with_current: bool = True):
+    """
+    Split archive sync into subtasks per service or per page range of large services
+    """
+    try:
+        logger.info("Synchronizing issues (fan-out) job is start")
+        if service_external_ids == []:
+            service_ids = [*await ServiceService.get_mapping_service_id_work_categories(SqlAlchemyUnitOfWork())]
+            service_ids.remove(20)
+            service_ids.remove(21)
+        else:
+            service_ids = service_external_ids
+
+        amelia_api: AmeliaApi = AmeliaApi()
+        amelia_api.auth()
+
+        sync_current_issues_casted_task = cast(Task, sync_current_issues)
+        sync_archive_casted_task = cast(Task, sync_archive)
+        callback = cast(Task, sync_issues_current_archive_chord_job_callback)
+
+        subtasks = []
+        if with_current:
+            subtasks.append(sync_current_issues_casted_task.s(delay, service_ids, None))
+
+        for service_id in service_ids:
+            params = amelia_api.create_json_for_request(APIGrids.ARCHIVE_ISSUES, service_id=service_id)
+            response = amelia_api.get(APIRoutes.ARCHIVE_ISSUES_WITH_QUERY, params=params)
+            if response is None:
+                logger.error(f"Page response for service_id: {service_id} is None")
+                continue
+
+            end_page = amelia_api.get_count_of_pages(handle_response_of_json_query(response, IssuePostSchema))
+            if end_page - 1 <= pages_per_task:
+                subtasks.append(sync_archive_casted_task.s(delay, [service_id], None))
+                continue
+
+            for start_page in range(1, end_page, pages_per_task):
+                borders: Borders = {"start": start_page, "end": min(start_page + pages_per_task, end_page)}
+                subtasks.append(sync_archive_casted_task.s(delay, [service_id], borders))
+
+        logger.info(f"Synchronizing issues (fan-out) job, subtasks: {len(subtasks)}")
+        job = chord(subtasks)
+        result = job(callback.s())
+    except Exception as e:
+        return f"Failed to enqueue tasks: {e}"
@@ -1,5 +1,5 @@
 from .base_model import Base
-from .db import Database, db
+from .db import Database, db, get_database, get_replica
 from app.db.models.building import Building
 from app.db.models.company import Company
 from app.db.models.facility import Facility
@@ -10,6 +10,7 @@ from app.db.models.room import Room
 from app.db.models.service import Service
 from app.db.models.status import Status
 from app.db.models.status_history import StatusHistory
+from app.db.models.issue_status_summary import IssueStatusSummary
 from app.db.models.user import User
 from app.db.models.work_category import WorkCategory
 from app.db.models.workflow import Workflow
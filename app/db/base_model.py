@@ -30,3 +30,4 @@ class BaseMixin:
 
 class BaseMixinAmelia(BaseMixin):
     external_id: Mapped[int] = mapped_column(unique=True)
+    row_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)
@@ -1,29 +1,170 @@
+from time import monotonic, perf_counter
+from uuid import uuid4
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine, async_sessionmaker,
     create_async_engine
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config import config
 
 
+REPLICATION_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class PoolMetrics:
+    """
+    Time spent waiting for a pooled connection
+    """
+
+    def __init__(self):
+        self.waits: int = 0
+        self.wait_time: float = 0
+        self.max_wait_time: float = 0
+
+    def add_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+
+class MeasuredAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics: PoolMetrics | None = None
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.add_wait(perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
 class Database:
-    def __init__(self, url: str, echo: bool = False):
+    def __init__(self, url: str, echo: bool = False, role: str = config.DB_POOL_ROLE):
+        self.url = url
+        self.echo = echo
+        self.configure(role)
+
+    def configure(self, role: str):
+        """
+        (Re)create the engine with the pool profile of the role.
+        Called before the first connection, e.g. on worker start
+        """
+        profile = config.DB_POOL_PROFILES[role]
+        connect_args: dict = {
+            "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        }
+        if config.DB_PGBOUNCER:
+            # transaction pooling, prepared statements are not kept between transactions
+            connect_args = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+
+        self.role = role
+        self.metrics = PoolMetrics()
+        self.lag_checked_at: float | None = None
+        self.is_lag_acceptable = False
         self.engine: AsyncEngine = create_async_engine(
-            url,
-            echo=echo,
-            pool_size=5,
-            max_overflow=10,
+            self.url,
+            echo=self.echo,
+            poolclass=MeasuredAsyncQueuePool,
+            pool_size=profile["pool_size"],
+            max_overflow=profile["max_overflow"],
+            pool_timeout=profile["pool_timeout"],
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            connect_args=connect_args,
             future=True
         )
-    
+        self.engine.sync_engine.pool.metrics = self.metrics
+
         self.async_session_factory: async_sessionmaker = async_sessionmaker(
             bind=self.engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False
         )
-    
+
     def get_async_sessionmaker(self) -> async_sessionmaker:
         return self.async_session_factory
 
-db: Database = Database(config.DB_URI, config.DB_ECHO) 
\ No newline at end of file
+    async def replication_lag(self) -> float | None:
+        """
+        Seconds the replica is behind the primary, 0 for a primary, None if it is unavailable
+        """
+        try:
+            async with self.engine.connect() as connection:
+                res = await connection.execute(text(REPLICATION_LAG_SQL))
+                return float(res.scalar_one())
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Failed to check replication lag: {e}")
+            return None
+
+    async def is_fresh(self) -> bool:
+        """
+        Lag is checked once per DB_REPLICA_LAG_CHECK_INTERVAL
+        """
+        now = monotonic()
+        if self.lag_checked_at is None or now - self.lag_checked_at > config.DB_REPLICA_LAG_CHECK_INTERVAL:
+            lag = await self.replication_lag()
+            self.is_lag_acceptable = lag is not None and lag <= config.DB_REPLICA_MAX_LAG
+            self.lag_checked_at = now
+            if not self.is_lag_acceptable:
+                logger.warning(f"Replica lag is {lag}, reading from the primary")
+        return self.is_lag_acceptable
+
+    def pool_status(self) -> dict:
+        pool = self.engine.sync_engine.pool
+        return {
+            "role": self.role,
+            "replica": self.url == config.DB_REPLICA_URI,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "waits": self.metrics.waits,
+            "wait_time": round(self.metrics.wait_time, 4),
+            "max_wait_time": round(self.metrics.max_wait_time, 4),
+        }
+
+
+databases: dict[tuple[str, str], Database] = {}
+
+
+def get_database(role: str, url: str = config.DB_URI) -> Database:
+    """
+    Separate pool for the role, e.g. heavy reports next to the API pool
+    """
+    if role == db.role and url == db.url:
+        return db
+    if (url, role) not in databases:
+        databases[(url, role)] = Database(url, config.DB_ECHO, role)
+    return databases[(url, role)]
+
+
+def get_replica(role: str) -> Database | None:
+    if config.DB_REPLICA_URI == "":
+        return None
+    return get_database(role, config.DB_REPLICA_URI)
+
+
+db: Database = Database(config.DB_URI, config.DB_ECHO)
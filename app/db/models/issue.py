@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy import DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_model import Base, BaseMixinAmelia, str_350
@@ -21,6 +21,13 @@ if TYPE_CHECKING:
 
 class Issue(Base, BaseMixinAmelia):
     __tablename__ = "issues"
+    __table_args__ = (
+        Index("ix_issues_created_at", "created_at"),
+        Index("ix_issues_service_id_created_at", "service_id", "created_at"),
+        Index("ix_issues_facility_id_created_at", "facility_id", "created_at"),
+        Index("ix_issues_building_id", "building_id"),
+        Index("ix_issues_work_category_id", "work_category_id"),
+    )
 
     description: Mapped[str]
     finish_date_plane: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_model import Base, str_350
+
+
+class IssueStatusSummary(Base):
+    __tablename__ = "issue_status_summary"
+    __table_args__ = (
+        Index("ix_issue_status_summary_first_status_created_at", "first_status_created_at"),
+        Index("ix_issue_status_summary_last_status", "last_status"),
+    )
+
+    issue_id: Mapped[int] = mapped_column(ForeignKey("issues.external_id", ondelete="CASCADE"), primary_key=True)
+    last_status_id: Mapped[int]
+    last_status: Mapped[str_350]
+    last_status_created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    pred_status: Mapped[str_350 | None]
+    pred_status_created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    first_status_created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    transitions_count: Mapped[int]
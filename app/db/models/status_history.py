@@ -1,5 +1,6 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
-from sqlalchemy import ForeignKey
+from sqlalchemy import DateTime, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_model import Base, BaseMixinAmelia, str_350
@@ -15,6 +16,25 @@ if TYPE_CHECKING:
 
 class StatusHistory(Base, BaseMixinAmelia):
     __tablename__ = "statuses_history"
+    # partitioned by month, partition key is a part of every unique constraint
+    __table_args__ = (
+        UniqueConstraint("external_id", "created_at", name="statuses_history_external_id_created_at_key"),
+        Index(
+            "ix_statuses_history_issue_id_external_id",
+            "issue_id", text("external_id DESC"),
+            postgresql_include=["status", "created_at"]
+        ),
+        Index(
+            "ix_statuses_history_issue_id_created_at",
+            "issue_id", "created_at",
+            postgresql_include=["status"]
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    external_id: Mapped[int] = mapped_column(unique=False)
 
     issue_id: Mapped[int] = mapped_column(ForeignKey("issues.external_id", ondelete="CASCADE"))
     message: Mapped[str]
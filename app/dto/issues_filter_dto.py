@@ -18,3 +18,4 @@ class IssueFilterDTO:
     current_statuses: list[str] | None
     limit: int
     offset: int
+    cursor: int | None = None
@@ -3,7 +3,7 @@ import json
 from datetime import date, timedelta
 from enum import Enum
 from time import sleep
-from typing import Any, TypedDict
+from typing import Any, AsyncIterator, Iterable, Sequence, Type, TypedDict
 from urllib.parse import urlencode
 
 from httpx import Response, TimeoutException, TimeoutException, ConnectError
@@ -12,6 +12,10 @@ from loguru import logger
 
 from app.huey.helpers import ReturnTypeFromJsonQuery
 from app.huey.helpers import TypeVarPydanticModels
+from app.utils.http_client_registry import HttpClientRegistry
+from app.utils.rate_limiter import RedisRateLimiter, TokenBucketRateLimiter
+from app.utils.response_cache import ResponseCache
+from app.utils.token_cache import TokenCache
 from config import config
 
 
@@ -72,10 +76,11 @@ class AmeliaApiAsync():
                 self,
                 base_url: str = config.API_BASE_URL,
                 pagination_per_page:  int = 20,
-                timeout: int = 100
+                timeout: int = 100,
+                rate_limit: float = config.API_CALLS_RATE_LIMIT,
+                concurrency: int = config.API_CALLS_CONCURRENCY
             ):
 
-            self.session = httpx.AsyncClient(timeout=timeout)
             self.base_url = base_url
             self.headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
@@ -86,7 +91,20 @@ class AmeliaApiAsync():
                 "per_page": pagination_per_page
             }
             self.timeout = timeout
-        
+            self.rate_limiter = TokenBucketRateLimiter.shared(base_url, rate_limit)
+            self.global_rate_limiter = RedisRateLimiter()
+            self.concurrency = concurrency
+            self.token_cache = TokenCache()
+            self.token_expires_at: float = 0
+            self.response_cache = ResponseCache()
+
+        @property
+        def session(self) -> httpx.AsyncClient:
+            """
+            Shared client of the current event loop
+            """
+            return HttpClientRegistry.get_async_client(self.timeout)
+
         def encode_params(self, params: dict):
             """
             Encodes the parameters to make sure array-like parameters are properly formatted.
@@ -97,19 +115,23 @@ class AmeliaApiAsync():
                     params[key] = ','.join(map(str, value))
             return urlencode(params)
         
-        async def get(self, route: str, params: str = "") -> Response | None:
+        async def get(self, route: str, params: str = "", headers: dict[str, str] | None = None) -> Response | None:
             flag = True
             response = None
             while flag:
                 try:
-                    response = await self.session.get(self.base_url + route + params, timeout=self.timeout)
+                    if self.token_expires_at and not TokenCache.is_fresh(self.token_expires_at):
+                        await self.auth()
+                    await self.rate_limiter.acquire()
+                    await self.global_rate_limiter.acquire_async()
+                    response = await self.session.get(self.base_url + route + params, headers=headers, timeout=self.timeout)
                     st_code = response.status_code 
                     
                     if st_code == 401:
                         logger.error(f"Some error: status code is {st_code}, text: {response.text}")
                         logger.error(response.json(), response.headers, sep="\n\n")
-                        await asyncio.sleep(20)
-                        await self.auth()
+                        if await self.auth(force=True, stale=self.sent_token(response)) != 0:
+                            await asyncio.sleep(config.API_CALLS_TIMEOUT_DELAY)
                         logger.info("Next try")
                         continue
                     elif st_code == 404:
@@ -130,19 +152,136 @@ class AmeliaApiAsync():
                     continue
             return response    
 
+        async def fetch_many(self, routes: Iterable[str], concurrency: int | None = None, conditional: bool = False) -> AsyncIterator[tuple[str, Response | None]]:
+            """
+            Fetch routes concurrently, results are yielded as they complete.
+            Conditional requests send validators of the remembered pages
+            """
+            semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+            async def fetch(route: str) -> tuple[str, Response | None]:
+                headers = self.response_cache.conditional_headers(route) if conditional and config.API_RESPONSE_CACHE else None
+                async with semaphore:
+                    return route, await self.get(route, headers=headers)
+
+            tasks = [asyncio.create_task(fetch(route)) for route in routes]
+            try:
+                for completed in asyncio.as_completed(tasks):
+                    yield await completed
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        async def get_if_changed(self, route: str, params: str = "") -> tuple[Response | None, bool]:
+            """
+            Conditional get, the flag is false when the page is the same as the remembered one
+            """
+            if not config.API_RESPONSE_CACHE:
+                return await self.get(route, params), True
+            response = await self.get(route, params, headers=self.response_cache.conditional_headers(route + params))
+            if response is None:
+                return None, True
+            return response, self.is_changed(route + params, response)
+
+        def is_changed(self, url: str, response: Response) -> bool:
+            if not config.API_RESPONSE_CACHE:
+                return True
+            return not self.response_cache.is_unchanged(url, response.status_code, response.content)
+
+        def remember(self, url: str, response: Response, ids: list[int] | None = None):
+            """
+            Remember the page after it was written to the database
+            """
+            if config.API_RESPONSE_CACHE:
+                self.response_cache.store(url, response.headers, response.content, ids)
+
+        def remembered_ids(self, url: str) -> list[int]:
+            return self.response_cache.ids(url)
+
+        def history_statuses_route(self, issue_id: int, page: int = 1) -> str:
+            params = self.create_json_for_request(APIGrids.ISSUES_STATUSES, page, issue_id=issue_id)
+            return APIRoutes.ISSUES_STATUSES_WITH_QUERY + self.encode_params(params)
+
+        async def fetch_many_with_retries(self, routes: dict[str, int], retries: int = config.API_HISTORY_RETRIES) -> AsyncIterator[tuple[str, Response | None]]:
+            """
+            fetch_many with failed routes requested again, None is yielded for routes failed every time
+            """
+            pending = routes
+            for attempt in range(retries + 1):
+                failed: dict[str, int] = {}
+                async for route, response in self.fetch_many(pending):
+                    if response is None or response.status_code != 200:
+                        failed[route] = pending[route]
+                        continue
+                    yield route, response
+                if failed == {}:
+                    return
+                logger.warning(f"{len(failed)} requests failed, attempt {attempt + 1} of {retries + 1}")
+                pending = failed
+                await asyncio.sleep(config.API_CALLS_TIMEOUT_DELAY)
+            for route in pending:
+                yield route, None
+
+        async def iter_history_statuses(
+                self,
+                issue_ids: Sequence[int],
+                model: Type[TypeVarPydanticModels],
+                window: int = config.API_HISTORY_WINDOW
+            ) -> AsyncIterator[tuple[int, list[TypeVarPydanticModels] | None]]:
+            """
+            Fetch history of many issues, first pages of a window go concurrently,
+            the remaining pages are computed from count. Yields the whole history of an issue,
+            None if some page of it failed after retries, so a partial history is never written
+            """
+            per_page = self.pagination["per_page"]
+            for start in range(0, len(issue_ids), window):
+                first_pages: dict[str, int] = {self.history_statuses_route(iss_id): iss_id for iss_id in issue_ids[start:start + window]}
+                next_pages: dict[str, int] = {}
+                histories: dict[int, list[TypeVarPydanticModels]] = {}
+                failed: set[int] = set()
+
+                async for route, response in self.fetch_many_with_retries(first_pages):
+                    iss_id = first_pages[route]
+                    if response is None:
+                        logger.error(f"Issue {iss_id} history statuses request error")
+                        failed.add(iss_id)
+                        continue
+
+                    response_data = ReturnTypeFromJsonQuery[model](**response.json())
+                    for page in range(2, -(-response_data.count // per_page) + 1):
+                        next_pages[self.history_statuses_route(iss_id, page)] = iss_id
+                    histories[iss_id] = list(response_data.data)
+
+                async for route, response in self.fetch_many_with_retries(next_pages):
+                    iss_id = next_pages[route]
+                    if response is None:
+                        logger.error(f"Issue {iss_id} history statuses request error")
+                        failed.add(iss_id)
+                        continue
+
+                    response_data = ReturnTypeFromJsonQuery[model](**response.json())
+                    histories[iss_id].extend(response_data.data)
+
+                for iss_id in issue_ids[start:start + window]:
+                    yield iss_id, None if iss_id in failed else histories[iss_id]
+
         async def patch(self, route: str, params) -> Response | None:
             flag = True
             response = None
             while flag:
                 try:
+                    if self.token_expires_at and not TokenCache.is_fresh(self.token_expires_at):
+                        await self.auth()
+                    await self.rate_limiter.acquire()
+                    await self.global_rate_limiter.acquire_async()
                     response = await self.session.patch(self.base_url + route, json=params, timeout=self.timeout)
                     st_code = response.status_code 
 
                     if st_code == 401:
                         logger.error(f"Some error: status code is {st_code}, text: {response.text}")
                         logger.error(response.json(), response.headers, sep="\n\n")
-                        await asyncio.sleep(20)
-                        await self.auth()
+                        if await self.auth(force=True, stale=self.sent_token(response)) != 0:
+                            await asyncio.sleep(config.API_CALLS_TIMEOUT_DELAY)
                         logger.info("Next try")
                         continue
                     elif st_code == 404:
@@ -307,7 +446,7 @@ class AmeliaApiAsync():
                 "page": page,
                 "sort_by": "id",
                 "descending": True,
-                "facility_id": 2,
+                "facility_id": kwargs.get("facility_id", 2),
                 # "query":"",
                 "filters[transition_status_id][]": [
                     "16,130,179", "33,125,177", "134", "6",
@@ -322,8 +461,34 @@ class AmeliaApiAsync():
 
             return params
 
-        async def auth(self) -> int:
+        @staticmethod
+        def sent_token(response: Response) -> str:
+            """
+            Token the request was sent with, other requests may have refreshed it since
+            """
+            return response.request.headers.get("Authorization", "").removeprefix("Bearer ")
+
+        async def auth(self, force: bool = False, stale: str | None = None) -> int:
+            """
+            Take the shared token from cache, login only when it is missing or expiring.
+            With force the stale token, the current one by default, is not reused.
+            """
+            if force and stale is None:
+                stale = self.headers["Authorization"].removeprefix("Bearer ")
+            cached = None if force else await self.token_cache.get_async()
+            if cached is None:
+                cached = await self.token_cache.refresh_async(self.login, stale or None)
+            if cached is None:
+                return 1
+
+            token, self.token_expires_at = cached
+            self.headers["Authorization"] = f"Bearer {token}"
+            self.session.headers.update(self.headers)
+            return 0
+
+        async def login(self) -> str | None:
             flag = True
+            token = None
             while flag:
                 try:
                     response = await self.session.post(
@@ -338,16 +503,15 @@ class AmeliaApiAsync():
                         timeout=self.timeout
                     )
                     if response.status_code != 200:
-                        return 1
+                        return None
                     else:
                         flag = False
-                        self.headers["Authorization"] = f"Bearer {response.json()['token']}"
-                        self.session.headers.update(self.headers)
+                        token = response.json()['token']
                 except Exception as e:
                     print("Some error: ", e)
-                    sleep(config.API_CALLS_DELAY)
+                    await asyncio.sleep(config.API_CALLS_DELAY)
                     continue
-            return 0
+            return token
 
         def get_pagination(self) -> Pagination:
             return self.pagination
@@ -1,9 +1,24 @@
 from huey import RedisHuey
 
+from app.db import db
+from app.utils.http_client_registry import HttpClientRegistry
+from app.utils.redis_manager import LoopPoolRegistry
 from config import config
 
 huey = RedisHuey(
     'huey_app',
     host=config.REDIS_HOST,
     port=config.REDIS_PORT,
-)
\ No newline at end of file
+)
+
+
+@huey.on_startup()
+def configure_db_pool():
+    if db.role != "worker":
+        db.configure("worker")
+
+
+@huey.on_shutdown()
+def close_http_clients():
+    HttpClientRegistry.close_all()
+    LoopPoolRegistry.close_all()
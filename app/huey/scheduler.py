@@ -4,6 +4,7 @@ from huey import crontab
 
 from app.huey.tasks.issues_tasks import sync_issues_dynamic
 from app.huey.tasks.organizations_tasks import patch_common_users
+from app.huey.tasks.partitions_tasks import create_statuses_history_partitions
 from logger import logger
 
 
@@ -23,4 +24,11 @@ def periodic_users():
 
     patch_common_users(pages=pages, delay=delay)
 
-    logger.info("Periodic users patch task triggered")
\ No newline at end of file
+    logger.info("Periodic users patch task triggered")
+
+
+@huey.periodic_task(crontab(minute='0', hour='2'))
+def periodic_partitions():
+    create_statuses_history_partitions()
+
+    logger.info("Periodic statuses history partitions task triggered")
\ No newline at end of file
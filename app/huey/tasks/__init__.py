@@ -1,3 +1,4 @@
 from app.huey.tasks.buildiing_tasks import *
 from app.huey.tasks.organizations_tasks import *
-from app.huey.tasks.issues_tasks import *
\ No newline at end of file
+from app.huey.tasks.issues_tasks import *
+from app.huey.tasks.partitions_tasks import *
\ No newline at end of file
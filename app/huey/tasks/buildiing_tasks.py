@@ -1,4 +1,4 @@
-from time import sleep
+from typing import Any
 
 from loguru import logger
 
@@ -14,6 +14,7 @@ from app.services.fasility_service import FacilityService
 from app.services.floor_service import FloorService
 from app.services.room_service import RoomService
 from app.services.tech_passport_service import TechPassportService
+from app.utils.mappers_cache import ReferenceVersion
 from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 from config import config
 from app.huey.helpers import handle_response_of_tech_passports, run_async_task
@@ -52,16 +53,20 @@ async def sync_buildings():
     try:
         building_service = BuildingService(uow)
 
+        changed_pages = 0
         for i in range(1, pages):
             params = amelia_api.create_json_for_request(APIGrids.BUILDINGS, i)
             params = amelia_api.encode_params(params)
 
-            response = await amelia_api.get(APIRoutes.BUILDINGS_WITH_QUERY, params=params)
+            response, changed = await amelia_api.get_if_changed(APIRoutes.BUILDINGS_WITH_QUERY, params=params)
 
             if response is None:
                 msg = "Buildings response is none"
                 logger.error(msg)
                 return msg
+            if not changed:
+                continue
+            changed_pages += 1
 
             response_data: ReturnTypeFromJsonQuery[BuildingPostSchema] = handle_response_of_json_query(response, BuildingPostSchema)
 
@@ -70,19 +75,19 @@ async def sync_buildings():
                 building.facility_id = facilities_name_id_mapped[building.facility_title]
                 buildings.append(building)
 
-            external_ids = [e.external_id for e in buildings]
-            existing_external_ids = await building_service.get_existing_external_ids(external_ids)
-            elements_to_insert = [element for element in buildings if element.external_id not in existing_external_ids]
-            element_to_update = [element for element in buildings if element.external_id in existing_external_ids]
-            if elements_to_insert != []:
-                await building_service.bulk_insert(elements_to_insert) 
-            if element_to_update != []:
-                await building_service.bulk_update(element_to_update) 
+            if buildings != [] and await building_service.bulk_upsert(buildings) != 0:
+                msg = "Buildings upserting error"
+                logger.error(msg)
+                return msg
+            amelia_api.remember(APIRoutes.BUILDINGS_WITH_QUERY + params, response)
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
 
+    logger.info(f"Buildings pages with changes: {changed_pages} of {pages - 1}")
+    if changed_pages != 0:
+        ReferenceVersion.bump()
     logger.info("Buildings were synchronized")
     return
 
@@ -117,16 +122,20 @@ async def sync_floors():
     try:
         floor_service = FloorService(uow)
 
+        changed_pages = 0
         for i in range(1, pages):
             params = amelia_api.create_json_for_request(APIGrids.FLOORS, i)
             params = amelia_api.encode_params(params)
 
-            response = await amelia_api.get(APIRoutes.FLOORS_WITH_QUERY, params=params)
+            response, changed = await amelia_api.get_if_changed(APIRoutes.FLOORS_WITH_QUERY, params=params)
 
             if response is None:
                 msg = "Floors response is none"
                 logger.error(msg)
                 return msg
+            if not changed:
+                continue
+            changed_pages += 1
     
             response_data: ReturnTypeFromJsonQuery[FloorPostSchema] = handle_response_of_json_query(response, FloorPostSchema)
 
@@ -137,20 +146,19 @@ async def sync_floors():
 
                 floors.append(floor)
 
-            external_ids = [e.external_id for e in floors]
-            existing_external_ids = await floor_service.get_existing_external_ids(external_ids)
-
-            elements_to_insert = [element for element in floors if element.external_id not in existing_external_ids]
-            element_to_update = [element for element in floors if element.external_id in existing_external_ids]
-            if elements_to_insert != []:
-                await floor_service.bulk_insert(elements_to_insert) 
-            if element_to_update != []:
-                await floor_service.bulk_update(element_to_update) 
+            if floors != [] and await floor_service.bulk_upsert(floors) != 0:
+                msg = "Floors upserting error"
+                logger.error(msg)
+                return msg
+            amelia_api.remember(APIRoutes.FLOORS_WITH_QUERY + params, response)
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
     
+    logger.info(f"Floors pages with changes: {changed_pages} of {pages - 1}")
+    if changed_pages != 0:
+        ReferenceVersion.bump()
     logger.info("Floors were synchronized")
     return
 
@@ -193,15 +201,22 @@ async def sync_rooms(delay: float=config.API_CALLS_DELAY, building_id: int | Non
         else:
             rooms_ids: set[int] = set(await room_service.rooms_ids(uow,))
 
+        routes: list[str] = []
         for i in range(1, pages):
             params = amelia_api.create_json_for_request(APIGrids.ROOMS, i, building_id=building_id)
             params = amelia_api.encode_params(params)
-            response = await amelia_api.get(APIRoutes.ROOMS_WITH_QUERY, params=params)
-            sleep(delay)
+            routes.append(APIRoutes.ROOMS_WITH_QUERY + params)
+
+        changed_pages = 0
+        async for route, response in amelia_api.fetch_many(routes, conditional=True):
             if response is None:
                 msg = "Rooms response is none"
                 logger.error(msg)
                 return msg
+            if not amelia_api.is_changed(route, response):
+                rooms_ids.difference_update(amelia_api.remembered_ids(route))
+                continue
+            changed_pages += 1
 
             response_data = handle_response_of_json_query(response, RoomPostSchema)
 
@@ -214,13 +229,11 @@ async def sync_rooms(delay: float=config.API_CALLS_DELAY, building_id: int | Non
                 rooms.append(s)
 
             external_ids = [e.external_id for e in rooms]
-            existing_external_ids = await room_service.get_existing_external_ids(external_ids)
-            elements_to_insert = [element for element in rooms if element.external_id not in existing_external_ids]
-            element_to_update = [element for element in rooms if element.external_id in existing_external_ids]
-            if elements_to_insert != []:
-                await room_service.bulk_insert(elements_to_insert) 
-            if element_to_update != []:
-                await room_service.bulk_update(element_to_update)
+            if rooms != [] and await room_service.bulk_upsert(rooms) != 0:
+                msg = "Rooms upserting error"
+                logger.error(msg)
+                return msg
+            amelia_api.remember(route, response, external_ids)
 
         if rooms_ids != []:
             await room_service.bulk_delete(list(rooms_ids))
@@ -228,6 +241,9 @@ async def sync_rooms(delay: float=config.API_CALLS_DELAY, building_id: int | Non
         logger.exception(f"Some error occurred: {e}")
         return e
 
+    logger.info(f"Rooms pages with changes: {changed_pages} of {pages - 1}")
+    if changed_pages != 0:
+        ReferenceVersion.bump()
     logger.info("Rooms were synchronized")
     return
 
@@ -252,38 +268,32 @@ async def sync_tech_passports(delay: float = config.API_CALLS_DELAY, facility_id
     try:
         tech_passport_service = TechPassportService(uow)
         tech_passports: list[TechPassportPostSchema] = []
-        for i in range(start, ids_len):
-            room_id = rooms_ids[i]
-            response = await amelia_api.get(APIRoutes.TECH_PASSPORT_WITH_ID + str(room_id))
-            sleep(delay)
-            if response is None:
-                continue
-            
-            tech_passport_validated: TechPassportPostSchema = handle_response_of_tech_passports(response, TechPassportPostSchema, room_id)
-            tech_passports.append(tech_passport_validated)
-
-            if i % 50 == 0 and i != 0:
-                logger.info(f"Sync {i} tech passports")
-
-            if i != 0 and (i % 50 == 0 or i == ids_len - 1):
-                elements_to_insert, elements_to_update = [], []
-                external_ids = [tech_passport.external_id for tech_passport in tech_passports]
-                existing_external_ids = await tech_passport_service.get_existing_external_ids(external_ids)
-                for tech_passport in tech_passports:
-                    if tech_passport.external_id in existing_external_ids:
-                        elements_to_update.append(tech_passport)
-                    else:
-                        elements_to_insert.append(tech_passport)
-
-                if elements_to_insert != []:
-                    await tech_passport_service.bulk_insert(elements_to_insert) 
-                if elements_to_update != []:
-                    await tech_passport_service.bulk_update(elements_to_update)
+        stats: dict[str, Any] = {"changed": 0}
+        routes: dict[str, int] = {APIRoutes.TECH_PASSPORT_WITH_ID + str(room_id): room_id for room_id in rooms_ids[start:ids_len]}
+        synced = start
+        async for route, response in amelia_api.fetch_many(routes):
+            synced += 1
+            if response is not None:
+                room_id = routes[route]
+                tech_passport_validated: TechPassportPostSchema = handle_response_of_tech_passports(response, TechPassportPostSchema, room_id)
+                tech_passports.append(tech_passport_validated)
+
+            if synced % 50 == 0:
+                logger.info(f"Sync {synced} tech passports")
+
+            if tech_passports != [] and (synced % 50 == 0 or synced == ids_len):
+                if await tech_passport_service.bulk_upsert(tech_passports, stats) != 0:
+                    msg = f"Tech passports between {tech_passports[0].external_id}-{tech_passports[-1].external_id} upserting error"
+                    logger.error(msg)
+                    return msg
                 tech_passports = []
 
     except Exception as e:
         logger.exception(f"Some error occurred: {e}")
         return e
     
+    logger.info(f"Tech passports changed: {stats['changed']}")
+    if stats["changed"] != 0:
+        ReferenceVersion.bump()
     logger.info("Tech passport were synchronized")
     return
\ No newline at end of file
@@ -1,4 +1,4 @@
-from asyncio import sleep
+import asyncio
 from datetime import datetime
 from typing import Any
 
@@ -15,6 +15,7 @@ from app.schemas.issue_schemas import IssuePostSchema
 from app.schemas.status_schemas import HistoryStatusRecord
 from app.services.history_status_service import HistoryStatusService
 from app.services.issue_service import IssueService
+from app.utils.sync_state import SyncStateManager
 from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 from config import config
 from logger import logger
@@ -22,7 +23,11 @@ from logger import logger
 
 
 
-async def sync_history_statuses(issue_ids: list[int], delay: float = config.API_CALLS_DELAY) -> list[HistoryStatusRecord]:
+async def sync_history_statuses(issue_ids: list[int], delay: float = config.API_CALLS_DELAY) -> tuple[list[HistoryStatusRecord], list[int]]:
+    """
+    New history statuses and ids of issues whose history was not fetched.
+    Errors are raised, so a failure is never taken for "no new statuses"
+    """
     uow = SqlAlchemyUnitOfWork()
 
     amelia_api: AmeliaApiAsync = AmeliaApiAsync()
@@ -31,39 +36,23 @@ async def sync_history_statuses(issue_ids: list[int], delay: float = config.API_
     history_status_service = HistoryStatusService(uow)
 
     statuses: list[HistoryStatusRecord] = []
-    try:
-        for iss_id in issue_ids:
-            page = 1
-            while True:
-                params = amelia_api.create_json_for_request(APIGrids.ISSUES_STATUSES, page, issue_id=iss_id)
-                params = amelia_api.encode_params(params)
-                response = await amelia_api.get(APIRoutes.ISSUES_STATUSES_WITH_QUERY, params=params)
-            
-                if response is None:
-                    logger.info("Issues history statuses response is none")
-                    return []
-                response_statuses_data: ReturnTypeFromJsonQuery[HistoryStatusRecord] = handle_response_of_json_query(response, HistoryStatusRecord)
-                response_len = len(response_statuses_data.data)
-                sts = ""
-                for resp_status in response_statuses_data.data:
-                    resp_status.issue_id = iss_id
-                    statuses.append(resp_status)
-                await sleep(delay)
-                if response_len < 20:
-                    break
-                page += 1
-        external_ids = [e.external_id for e in statuses]
-        statuses_existing_external_ids = await history_status_service.get_existing_external_ids(external_ids)
-        elements_to_insert = [element for element in statuses if element.external_id not in statuses_existing_external_ids]
-        logger.info(issue_ids)
-        logger.info(external_ids)
-        logger.info(statuses_existing_external_ids)
-        logger.info([(e.issue_id, e.external_id) for e in elements_to_insert])
-
-    except Exception as e:
-        logger.exception(f"Some error occurred: {e}")
-        return []
-    return elements_to_insert
+    failed_issue_ids: list[int] = []
+    async for iss_id, records in amelia_api.iter_history_statuses(issue_ids, HistoryStatusRecord):
+        if records is None:
+            logger.error(f"History statuses of issue {iss_id} were not fetched")
+            failed_issue_ids.append(iss_id)
+            continue
+        for resp_status in records:
+            resp_status.issue_id = iss_id
+            statuses.append(resp_status)
+    external_ids = [e.external_id for e in statuses]
+    statuses_existing_external_ids = await history_status_service.get_existing_external_ids(external_ids)
+    elements_to_insert = [element for element in statuses if element.external_id not in statuses_existing_external_ids]
+    logger.info(issue_ids)
+    logger.info(external_ids)
+    logger.info(statuses_existing_external_ids)
+    logger.info([(e.issue_id, e.external_id) for e in elements_to_insert])
+    return elements_to_insert, failed_issue_ids
 
 async def map_issue(iss: IssuePostSchema, mappers: dict) -> IssuePostSchema:
     building_title = iss.building_title.split("/")[0][:-1]
@@ -89,55 +78,66 @@ async def map_issue(iss: IssuePostSchema, mappers: dict) -> IssuePostSchema:
 
     return iss
 
-async def sync_issues(issues_id: list[int], delay: float = config.API_CALLS_DELAY):
+async def sync_issues(issues_id: list[int], delay: float = config.API_CALLS_DELAY, mappers: dict[str, Any] | None = None) -> tuple[list[IssuePostSchema], list[int]]:
+    """
+    Mapped issue cards and ids of issues whose card was not fetched or mapped.
+    Issues missing in Amelia are skipped
+    """
     amelia_api: AmeliaApiAsync = AmeliaApiAsync()
     await amelia_api.auth()
 
-    uow = SqlAlchemyUnitOfWork()
-    mappers: dict[str, Any] = await ServicesMappers.mappers(uow)
+    if mappers is None:
+        mappers = await ServicesMappers.mappers(SqlAlchemyUnitOfWork())
+
+    routes: dict[str, int] = {APIRoutes.ISSUE + "/" + str(iss_id): iss_id for iss_id in issues_id}
 
     issues_for_inserting: list[IssuePostSchema] = []
-    for iss_id in issues_id:
-        response = await amelia_api.get(APIRoutes.ISSUE + "/" +str(iss_id))
-        if response and response.status_code == 404:
+    failed_issue_ids: list[int] = []
+    async for route, response in amelia_api.fetch_many(routes):
+        iss_id = routes[route]
+        if response is not None and response.status_code == 404:
             continue
-        if not response: 
+        if response is None or response.status_code != 200:
             logger.error(f"Issue {iss_id} request error")
-            return []
-        iss: IssuePostSchema = IssuePostSchema(**response.json()["common"]["data"])
+            failed_issue_ids.append(iss_id)
+            continue
         try:
+            iss: IssuePostSchema = IssuePostSchema(**response.json()["common"]["data"])
             mapped_iss = await map_issue(iss, mappers)
         except Exception as er:
-            logger.error(f"Wrong mapping for issue {iss.external_id}")
+            logger.error(f"Wrong mapping for issue {iss_id}: {er}")
+            failed_issue_ids.append(iss_id)
             continue
         issues_for_inserting.append(mapped_iss)
-        await sleep(delay)
 
-
-    return issues_for_inserting
+    return issues_for_inserting, failed_issue_ids
 
 # @huey.task()
 @run_async_task
-async def sync_issues_dynamic(page: None | int = None, issues_id: list[int] = [], time_range: list[str] = [], delay: float = config.API_CALLS_DELAY):
+async def sync_issues_dynamic(page: None | int = None, issues_id: list[int] = [], time_range: list[str] = [], delay: float = config.API_CALLS_DELAY, facility_id: int = 2):
     start  = datetime.now()
+    run_started_at = SyncStateManager.now()
+    sync_state = SyncStateManager()
+    advance_mark = issues_id == [] and time_range == []
     uow = SqlAlchemyUnitOfWork()
-    #? НЕ ЗАБЫТЬ поменять время и заюзать паге каунт 
     amelia_api: AmeliaApiAsync = AmeliaApiAsync()
     await amelia_api.auth()
 
-    issues_service = IssueService(uow)
-
     logger.info(f"Start issues sync process")
 
+    routes: list[str] = []
     if issues_id == []:
         if time_range == []:
-            tr = amelia_api.check_time_range(time_range)
+            tr = await sync_state.delta_time_range(facility_id)
+            if tr == []:
+                tr = amelia_api.check_time_range(time_range)
             if tr == []:
                 logger.info("Stop sync process, wrong time range")
+                return
         else:
             tr = time_range
         logger.info(f"{tr}")
-        url = amelia_api.generate_query_params_issues(page=1, start_date=tr[0], end_date=tr[1])
+        url = amelia_api.generate_query_params_issues(page=1, start_date=tr[0], end_date=tr[1], facility_id=facility_id)
         params = amelia_api.encode_params(url)
         logger.info(APIRoutes.DYNAMIC_ISSUES + params)
         dynamic_iss_response = await amelia_api.get(APIRoutes.DYNAMIC_ISSUES + params)
@@ -145,52 +145,144 @@ async def sync_issues_dynamic(page: None | int = None, issues_id: list[int] = []
             logger.error("Dynamic issues response is none.")
             return
         response: DynamicIssuesResponse = DynamicIssuesResponse(**dynamic_iss_response.json())
-        if page is None:
-            page_count = response.page_count(amelia_api.pagination["per_page"])
-        else:
+        page_count = response.page_count(amelia_api.pagination["per_page"])
+        if page is not None and page < page_count:
+            logger.info(f"Issues list is truncated to {page} pages")
+            advance_mark = False
             page_count = page
-        issues: list[ShortIssue] = []
 
         for i in range(1, page_count):
-
-            url = amelia_api.generate_query_params_issues(page=i, start_date=tr[0], end_date=tr[1])
+            url = amelia_api.generate_query_params_issues(page=i, start_date=tr[0], end_date=tr[1], facility_id=facility_id)
             params = amelia_api.encode_params(url)
-            dynamic_iss_response = await amelia_api.get(APIRoutes.DYNAMIC_ISSUES + params)
-
-            if dynamic_iss_response is None:
-                logger.error("Dynamic issues response is none.")
+            routes.append(APIRoutes.DYNAMIC_ISSUES + params)
+
+    batch_size = config.DYNAMIC_ISSUES_BATCH_SIZE
+    issues_queue: asyncio.Queue[tuple[list[int], bool] | None] = asyncio.Queue(config.DYNAMIC_ISSUES_QUEUE_SIZE)
+    cards_queue: asyncio.Queue[tuple[list[IssuePostSchema], bool] | None] = asyncio.Queue(config.DYNAMIC_ISSUES_QUEUE_SIZE)
+    history_queue: asyncio.Queue[tuple[list[IssuePostSchema], list[HistoryStatusRecord], bool] | None] = asyncio.Queue(config.DYNAMIC_ISSUES_QUEUE_SIZE)
+    stats = {"inserted": 0, "updated": 0, "failed": 0}
+
+    async def list_issues():
+        """
+        Split listed issues into batches for inserting and updating
+        """
+        issues_for_inserting: list[int] = []
+        issues_for_updating: list[int] = []
+
+        async def put_batches(force: bool = False):
+            nonlocal issues_for_inserting, issues_for_updating
+            if issues_for_inserting != [] and (force or len(issues_for_inserting) >= batch_size):
+                await issues_queue.put((issues_for_inserting, True))
+                issues_for_inserting = []
+            if issues_for_updating != [] and (force or len(issues_for_updating) >= batch_size):
+                await issues_queue.put((issues_for_updating, False))
+                issues_for_updating = []
+
+        async def list_batches():
+            nonlocal advance_mark
+            if issues_id != []:
+                for i in range(0, len(issues_id), batch_size):
+                    ids_batch = list(set(issues_id[i:i + batch_size]))
+                    existed_issues_with_statuses = await IssueService.get_last_statuses_by_id(uow, ids_batch)
+                    issues_for_inserting.extend([iss_id for iss_id in ids_batch if iss_id not in existed_issues_with_statuses])
+                    issues_for_updating.extend([iss_id for iss_id in ids_batch if iss_id in existed_issues_with_statuses])
+                    await put_batches()
                 return
 
-            response = DynamicIssuesResponse[ShortIssue](**dynamic_iss_response.json())
-            issues.extend(response.data)
-        issues_id = [iss.id for iss in issues]
-
-        existed_issues_with_statuses = await issues_service.get_last_statuses_by_id(uow, issues_id)
-
-        issues_id_for_inserting = list(set([sh_iss.id for sh_iss in issues if sh_iss.id not in existed_issues_with_statuses]))
-        issues_id_for_updating = list(set([sh_iss.id for sh_iss in issues if sh_iss.id in existed_issues_with_statuses and sh_iss.state != existed_issues_with_statuses[sh_iss.id]]))
-    else:
-        existed_issues_with_statuses = await issues_service.get_last_statuses_by_id(uow, issues_id)
-        issues_id_for_inserting = list(set([iss_id for iss_id in issues_id if iss_id not in existed_issues_with_statuses]))
-        issues_id_for_updating = list(set([iss_id for iss_id in issues_id if iss_id in existed_issues_with_statuses]))
-
-    logger.info(f"For insert: {len(issues_id_for_inserting)}, for update: {len(issues_id_for_updating)}")
-    
-    if issues_id_for_inserting != []:
-        logger.info(f"Sync new issues, start {issues_id_for_inserting[0]}")
-        mapped_iss = await sync_issues(issues_id_for_inserting, delay)
-        statuses = await sync_history_statuses([ms.external_id for ms in mapped_iss])
-        if mapped_iss != [] and statuses != []:
-            await issues_service.bulk_insert_new_issues_with_statuses(mapped_iss, statuses)
-
-    if issues_id_for_updating != []:
-        logger.info(f"Sync existed issues, start {issues_id_for_updating[0]}")
-        mapped_iss = await sync_issues(issues_id_for_updating, delay)
-        statuses = await sync_history_statuses([ms.external_id for ms in mapped_iss])
-        if mapped_iss != []:
-            await issues_service.bulk_update_issues_with_statuses(mapped_iss, statuses)
-
-    logger.info(f"Was inserted: {len(issues_id_for_inserting)}, updated: {len(issues_id_for_updating)}")
+            listed_ids: set[int] = set()
+            async for _, dynamic_iss_response in amelia_api.fetch_many(routes):
+                if dynamic_iss_response is None:
+                    logger.error("Dynamic issues response is none.")
+                    advance_mark = False
+                    return
+
+                response = DynamicIssuesResponse[ShortIssue](**dynamic_iss_response.json())
+                issues = [sh_iss for sh_iss in response.data if sh_iss.id not in listed_ids]
+                listed_ids.update(sh_iss.id for sh_iss in issues)
+
+                existed_issues_with_statuses = await IssueService.get_last_statuses_by_id(uow, [sh_iss.id for sh_iss in issues])
+                issues_for_inserting.extend([sh_iss.id for sh_iss in issues if sh_iss.id not in existed_issues_with_statuses])
+                issues_for_updating.extend([sh_iss.id for sh_iss in issues if sh_iss.id in existed_issues_with_statuses and sh_iss.state != existed_issues_with_statuses[sh_iss.id]])
+                await put_batches()
+        await list_batches()
+        # not in finally: when another stage fails, the task group cancels this task
+        # and no consumer is left to take the last batches and the sentinel
+        await put_batches(force=True)
+        await issues_queue.put(None)
+
+    async def fetch_cards():
+        """
+        Fetch and map issue cards, failed cards are counted and keep the mark in place
+        """
+        nonlocal advance_mark
+        mappers: dict[str, Any] = await ServicesMappers.mappers(SqlAlchemyUnitOfWork())
+        while (batch := await issues_queue.get()) is not None:
+            ids_batch, is_new = batch
+            try:
+                mapped_iss, failed_issue_ids = await sync_issues(ids_batch, delay, mappers)
+            except Exception as e:
+                logger.exception(f"Cards of {len(ids_batch)} issues were not synced: {e}")
+                mapped_iss, failed_issue_ids = [], ids_batch
+
+            if failed_issue_ids != []:
+                stats["failed"] += len(failed_issue_ids)
+                advance_mark = False
+            if mapped_iss != []:
+                await cards_queue.put((mapped_iss, is_new))
+        await cards_queue.put(None)
+
+    async def fetch_histories():
+        """
+        Fetch history statuses for mapped issues, issues without a complete history are not written
+        """
+        nonlocal advance_mark
+        while (batch := await cards_queue.get()) is not None:
+            mapped_iss, is_new = batch
+            try:
+                statuses, failed_issue_ids = await sync_history_statuses([ms.external_id for ms in mapped_iss], delay)
+            except Exception as e:
+                logger.exception(f"History statuses of {len(mapped_iss)} issues were not synced: {e}")
+                stats["failed"] += len(mapped_iss)
+                advance_mark = False
+                continue
+
+            if failed_issue_ids != []:
+                stats["failed"] += len(failed_issue_ids)
+                advance_mark = False
+                mapped_iss = [ms for ms in mapped_iss if ms.external_id not in failed_issue_ids]
+            if mapped_iss != []:
+                await history_queue.put((mapped_iss, statuses, is_new))
+        await history_queue.put(None)
+
+    async def write_issues():
+        """
+        Write every batch as soon as it is ready
+        """
+        issues_service = IssueService(SqlAlchemyUnitOfWork())
+        while (batch := await history_queue.get()) is not None:
+            mapped_iss, statuses, is_new = batch
+            if is_new:
+                if statuses == []:
+                    # an empty history is not a failure, the issues are taken again once they have statuses
+                    logger.warning(f"New issues without history statuses were skipped: {[ms.external_id for ms in mapped_iss]}")
+                    continue
+                result = await issues_service.bulk_insert_new_issues_with_statuses(mapped_iss, statuses)
+                stats["inserted"] += len(mapped_iss) if result == 0 else 0
+            else:
+                result = await issues_service.bulk_update_issues_with_statuses(mapped_iss, statuses)
+                stats["updated"] += len(mapped_iss) if result == 0 else 0
+            stats["failed"] += len(mapped_iss) if result != 0 else 0
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(list_issues())
+        tg.create_task(fetch_cards())
+        tg.create_task(fetch_histories())
+        tg.create_task(write_issues())
+
+    logger.info(f"Was inserted: {stats['inserted']}, updated: {stats['updated']}, failed: {stats['failed']}")
+
+    if advance_mark and stats["failed"] == 0:
+        await sync_state.set_high_water_mark(facility_id, run_started_at)
 
     end = datetime.now()
     duration_in_minutes = (end - start).total_seconds() / 60
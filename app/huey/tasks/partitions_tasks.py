@@ -0,0 +1,12 @@
+from app.huey.helpers import run_async_task
+from app.services.history_status_service import HistoryStatusService
+from app.utils.unit_of_work import SqlAlchemyUnitOfWork
+from config import config
+from logger import logger
+
+
+@run_async_task
+async def create_statuses_history_partitions(months_ahead: int = config.STATUSES_HISTORY_PARTITIONS_AHEAD):
+    history_status_service = HistoryStatusService(SqlAlchemyUnitOfWork())
+    if await history_status_service.create_partitions(months_ahead) != 0:
+        logger.error("Statuses history partitions were not created")
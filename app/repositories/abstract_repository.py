@@ -1,8 +1,11 @@
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from typing import Generic, Optional, Sequence, Type, TypeVar, Union
 
 from pydantic import BaseModel
 from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import count
 
@@ -12,6 +15,19 @@ from app.utils.benchmark import perfomance_timer
 T = TypeVar('T', bound=BaseMixin)
 TA = TypeVar('TA', bound=BaseMixinAmelia)
 
+POSTGRES_MAX_PARAMS = 32767
+
+
+def row_hash(row: dict) -> str:
+    """
+    Content hash of a mapped row, unchanged rows are skipped by upserts
+    """
+    content = json.dumps({k: v for k, v in row.items() if k != "row_hash"}, sort_keys=True, default=str)
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+def conflict_keys(conflict_key: str | Sequence[str]) -> list[str]:
+    return [conflict_key] if isinstance(conflict_key, str) else list(conflict_key)
+
 # T = TypeVar('T', bound = Base)
 
 class AbstractRepository(ABC, Generic[T]):
@@ -44,6 +60,14 @@ class AbstractRepository(ABC, Generic[T]):
     async def bulk_insert(self, data: list[dict]) -> int:
         raise NotImplementedError
 
+    @abstractmethod
+    async def bulk_upsert(self, data: list[dict], conflict_key: str | Sequence[str] = "external_id", update_columns: Sequence[str] | None = None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def bulk_load(self, data: list[dict], conflict_key: str | Sequence[str] = "external_id", update_columns: Sequence[str] | None = None) -> int:
+        raise NotImplementedError
+
     @abstractmethod
     async def get_count(self) -> int:
         raise NotImplementedError
@@ -94,7 +118,10 @@ class SQLAlchemyRepository(AbstractRepository[TA]):
         return res.scalar_one()
 
     async def bulk_update_by_external_ids(self, data: list[dict]) -> int:
+        with_hash = "row_hash" in self.model.__table__.columns
         for item in data:
+            if with_hash:
+                item = {**item, "row_hash": row_hash(item)}
             stmt = (
                 update(self.model).
                 where(self.model.external_id == item["external_id"]).
@@ -114,6 +141,114 @@ class SQLAlchemyRepository(AbstractRepository[TA]):
         res = await self.async_session.execute(*stmt)
         return 0
 
+    async def bulk_upsert(
+            self,
+            data: list[dict],
+            conflict_key: str | Sequence[str] = "external_id",
+            update_columns: Sequence[str] | None = None,
+            chunk_size: int = 1000
+        ) -> int:
+        """
+        INSERT ... ON CONFLICT DO UPDATE in multi-row statements.
+        All columns except the key are updated by default, empty update_columns means DO NOTHING.
+        Rows with the same row_hash are not rewritten. Returns count of written rows
+        """
+        if data == []:
+            return 0
+
+        keys = conflict_keys(conflict_key)
+        rows = list({tuple(item[k] for k in keys): item for item in data}.values())
+        with_hash = "row_hash" in self.model.__table__.columns
+        if with_hash:
+            rows = [{**row, "row_hash": row_hash(row)} for row in rows]
+        columns = rows[0].keys()
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in (*keys, "id", "created_at")]
+        chunk_size = max(1, min(chunk_size, POSTGRES_MAX_PARAMS // (len(columns) + 2)))
+
+        written = 0
+        for i in range(0, len(rows), chunk_size):
+            stmt = pg_insert(self.model).values(rows[i:i + chunk_size])
+            if update_columns == []:
+                stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+            else:
+                set_ = {c: stmt.excluded[c] for c in update_columns}
+                if "updated_at" not in set_:
+                    set_["updated_at"] = func.now()
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=keys,
+                    set_=set_,
+                    where=self.model.row_hash.is_distinct_from(stmt.excluded.row_hash) if with_hash else None
+                )
+            res = await self.async_session.execute(stmt)
+            written += max(res.rowcount, 0)
+
+        return written
+
+    async def bulk_load(
+            self,
+            data: list[dict],
+            conflict_key: str | Sequence[str] = "external_id",
+            update_columns: Sequence[str] | None = None
+        ) -> int:
+        """
+        COPY rows into a temp table and merge them with one upsert.
+        Runs in the session transaction, the temp table is dropped on commit.
+        Returns count of written rows
+        """
+        if data == []:
+            return 0
+
+        keys = conflict_keys(conflict_key)
+        rows = list({tuple(item[k] for k in keys): item for item in data}.values())
+        table = self.model.__table__
+        with_hash = "row_hash" in table.columns
+        if with_hash:
+            rows = [{**row, "row_hash": row_hash(row)} for row in rows]
+        columns = [c.name for c in table.columns if c.name in rows[0]]
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in (*keys, "id", "created_at")]
+        temp_table = f"{table.name}_load"
+
+        connection = await self.async_session.connection()
+        quote = connection.dialect.identifier_preparer.quote
+        quoted_columns = ", ".join(quote(c) for c in columns)
+        await connection.exec_driver_sql(
+            f"CREATE TEMP TABLE IF NOT EXISTS {temp_table} ON COMMIT DROP AS "
+            f"SELECT {quoted_columns} FROM {table.name} WITH NO DATA"
+        )
+        await connection.exec_driver_sql(f"TRUNCATE {temp_table}")
+
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            temp_table,
+            records=[tuple(row[c] for c in columns) for row in rows],
+            columns=columns
+        )
+
+        insert_columns = quoted_columns
+        select_columns = quoted_columns
+        if "created_at" in table.columns and "created_at" not in columns:
+            insert_columns += ", created_at"
+            select_columns += ", now()"
+
+        if update_columns == []:
+            on_conflict = "DO NOTHING"
+        else:
+            set_ = [f"{quote(c)} = EXCLUDED.{quote(c)}" for c in update_columns]
+            if "updated_at" in table.columns and "updated_at" not in update_columns:
+                set_.append("updated_at = now()")
+            on_conflict = "DO UPDATE SET " + ", ".join(set_)
+            if with_hash:
+                on_conflict += f" WHERE {table.name}.row_hash IS DISTINCT FROM EXCLUDED.row_hash"
+
+        res = await connection.exec_driver_sql(
+            f"INSERT INTO {table.name} ({insert_columns}) "
+            f"SELECT {select_columns} FROM {temp_table} "
+            f"ON CONFLICT ({', '.join(quote(k) for k in keys)}) {on_conflict}"
+        )
+        return max(res.rowcount, 0)
+
     async def get_count(self, **kwargs) -> int:
 
         stmt = (
@@ -205,5 +340,11 @@ class SQLAlchemyBaseRepository(AbstractRepository[T]):
     async def bulk_insert(self, data: list[dict]) -> int:
         ...
 
+    async def bulk_upsert(self, data: list[dict], conflict_key: str | Sequence[str] = "external_id", update_columns: Sequence[str] | None = None) -> int:
+        ...
+
+    async def bulk_load(self, data: list[dict], conflict_key: str | Sequence[str] = "external_id", update_columns: Sequence[str] | None = None) -> int:
+        ...
+
     async def get_count(self) -> int:
         ...
\ No newline at end of file
@@ -3,18 +3,18 @@ from functools import lru_cache
 from typing import Sequence
 
 from loguru import logger
-from sqlalchemy import (ARRAY, CTE, INTEGER, TEXT, Case, ColumnElement, Result, Row,
-                        Select, Subquery, TextClause, and_, between, bindparam, desc, func, literal_column, select, text)
+from sqlalchemy import (ARRAY, CTE, INTEGER, TEXT, ColumnElement, Result, Row,
+                        Select, Subquery, TextClause, and_, between, bindparam, func, literal_column, select, text)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import Building, Company
 from app.db.models import issue
 from app.db.models import status_history
 from app.db.models.issue import Issue
+from app.db.models.issue_status_summary import IssueStatusSummary
 from app.db.models.priority import Priority
 from app.db.models.room import Room
 from app.db.models.service import Service
-from app.db.models.status_history import StatusHistory
 from app.db.models.user import User
 from app.db.models.work_category import WorkCategory
 from app.dto.issues_filter_dto import IssueFilterDTO
@@ -28,46 +28,17 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
 
 
     async def get_all_external_ids_with_included_statuses(self, service_id: int, statuses: list[str]) -> Sequence[int]:
-        last_statuses_ids: CTE = (
-            select(
-                StatusHistory.issue_id,
-                func.max(StatusHistory.external_id).label("latest_status_id")
-            )
-            .group_by(StatusHistory.issue_id)
-            .cte("latest_status_subquery")
-        )
-
-        last_statuses_with_msg: CTE = (
+        current_issues_with_statuses: Select = (
             select(
-                StatusHistory.issue_id,
-                StatusHistory.status
+                self.model.external_id
             )
             .join(
-                last_statuses_ids,
-                StatusHistory.external_id == last_statuses_ids.c.latest_status_id
+                IssueStatusSummary,
+                IssueStatusSummary.issue_id == self.model.external_id
             )
             .where(
-                StatusHistory.status.in_(statuses)
-            )
-            .cte("latest_statuses_with_message")
-        )
-
-        exsists_issues_in_service: CTE = (
-            select(
-                self.model.external_id,
-            )
-            .where(self.model.service_id == service_id)
-            .cte("exsists_issues_ext_id")
-        )
-
-        current_issues_with_statuses: Select = (
-            select(
-                exsists_issues_in_service.c.external_id,
-                last_statuses_with_msg.c.status
-            )
-            .outerjoin(
-                exsists_issues_in_service,
-                exsists_issues_in_service.c.external_id == last_statuses_with_msg.c.issue_id
+                self.model.service_id == service_id,
+                IssueStatusSummary.last_status.in_(statuses)
             )
         )
 
@@ -105,51 +76,6 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
                 ).order_by(self.model.created_at.desc())
             ).cte("filtered_issues_subquery")
         
-        last_statuses_ids_cte: CTE = (
-            select(
-                StatusHistory.issue_id,
-                func.max(StatusHistory.external_id).label("latest_status_id")
-            )
-            .group_by(StatusHistory.issue_id)
-            .cte("latest_status_subquery")
-        )
-
-        last_statuses_with_msg: CTE = (
-            select(
-                StatusHistory.issue_id,
-                StatusHistory.status,
-                StatusHistory.created_at,
-            )
-            .join(
-                last_statuses_ids_cte,
-                StatusHistory.external_id == last_statuses_ids_cte.c.latest_status_id
-            )
-            .cte("latest_statuses_with_message")
-        )
-
-        ranked_statuses_cte: CTE = (
-            select(
-                StatusHistory.issue_id,
-                StatusHistory.status,
-                StatusHistory.created_at,
-                func.row_number().over(
-                    partition_by=StatusHistory.issue_id,
-                    order_by=StatusHistory.external_id.desc()
-                ).label('rank')
-            )
-            .cte("ranked_statuses_subquery")
-        )
-
-        prelast_statuses_cte: CTE = (
-            select(
-                ranked_statuses_cte.c.issue_id,
-                ranked_statuses_cte.c.status,
-                ranked_statuses_cte.c.created_at
-            )
-            .where(ranked_statuses_cte.c.rank == 2)
-            .cte("prelast_statuses_with_message")
-        )
-
         stmt: Select = (
             # select(filtered_issues_cte, Service.title, WorkCategory.title, Building.title, Room.title, User.first_name, User.middle_name, User.last_name, Company.full_name, last_statuses_with_msg.c.status, last_statuses_with_msg.c.created_at, prelast_statuses_cte.c.status, prelast_statuses_cte.c.created_at, Priority.title)
             select(
@@ -170,10 +96,10 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
                 User.middle_name,  # 14
                 User.last_name,  # 15
                 Company.full_name,  # 16
-                last_statuses_with_msg.c.status,  # 17
-                last_statuses_with_msg.c.created_at,  # 18
-                prelast_statuses_cte.c.status,  # 19
-                prelast_statuses_cte.c.created_at,  # 20
+                IssueStatusSummary.last_status,  # 17
+                IssueStatusSummary.last_status_created_at,  # 18
+                IssueStatusSummary.pred_status,  # 19
+                IssueStatusSummary.pred_status_created_at,  # 20
                 Priority.title  # 21
             )
             .join(Service, Service.external_id == filtered_issues_cte.c.service_id)
@@ -183,9 +109,9 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
             .outerjoin(User, User.id == filtered_issues_cte.c.executor_id)
             # .outerjoin(Company, User.id == filtered_issues_cte.c.company_id)
             .outerjoin(Company, User.company_id == Company.id)
-            .join(last_statuses_with_msg, last_statuses_with_msg.c.issue_id == filtered_issues_cte.c.external_id)
-            .join(prelast_statuses_cte, prelast_statuses_cte.c.issue_id == filtered_issues_cte.c.external_id)
+            .join(IssueStatusSummary, IssueStatusSummary.issue_id == filtered_issues_cte.c.external_id)
             .outerjoin(Priority, Priority.id  == filtered_issues_cte.c.priority_id)
+            .where(IssueStatusSummary.pred_status.is_not(None))
         )
         query_res: Result = await self.async_session.execute(stmt)
         res: Sequence[Row] = query_res.all()
@@ -223,59 +149,54 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
         self,
         select_statement: str = "",
         pagination_statement: str = "",
-        order_by_statement: str = ""
+        order_by_statement: str = "",
+        cursor_statement: str = ""
     ) -> TextClause:
         stmt = text(
             f"""
             with filtered_by_timings_subq as (
                 select 
-                    distinct created_in_tr_subq.issue_id
-                from (
-                    select
-                        issue_id
-                    from (
-                        select
-                            issue_id,
-                            min(created_at) as min_created_id
-                        from statuses_history
-                        group by issue_id
-                    )
-                    where min_created_id  BETWEEN :start_date AND :end_date
-                    -- where min_created_id AT TIME ZONE 'Australia/Sydney'  BETWEEN :start_date AND :end_date
-                    order by issue_id desc
-                ) created_in_tr_subq
-                join (
-                    select 
-                        issue_id
-                    from statuses_history
-                    where created_at  BETWEEN :transition_start_date AND :transition_end_date
-                    -- where created_at AT TIME ZONE 'Australia/Sydney' BETWEEN :transition_start_date AND :transition_end_date
-                    and (:transition_statuses IS NULL OR status = ANY(:transition_statuses))  
-                ) transmit_in_statuses_subq 
-                on created_in_tr_subq.issue_id = transmit_in_statuses_subq.issue_id
+                    iss.issue_id
+                from issue_status_summary iss
+                where iss.first_status_created_at  BETWEEN :start_date AND :end_date
+                -- where iss.first_status_created_at AT TIME ZONE 'Australia/Sydney'  BETWEEN :start_date AND :end_date
+                and exists (
+                    select 1
+                    from statuses_history sh
+                    where sh.issue_id = iss.issue_id
+                    and sh.created_at  BETWEEN :transition_start_date AND :transition_end_date
+                    -- and sh.created_at AT TIME ZONE 'Australia/Sydney' BETWEEN :transition_start_date AND :transition_end_date
+                    and (:transition_statuses IS NULL OR sh.status = ANY(:transition_statuses))  
+                )
+                {cursor_statement}
             ),
 
             last_status_filter as (
                 select 
                     fbts.issue_id,
-                    sh.status,
+                    last_sh.status,
                     i.building_id,
                     i.service_id,
                     i.work_category_id,
                     i.room_id,
                     i.priority_id,
-                    i.urgency,
-                    ROW_NUMBER() over (PARTITION BY sh.issue_id order by sh.created_at DESC) as rn
-                from statuses_history sh 
-                join filtered_by_timings_subq fbts on sh.issue_id = fbts.issue_id
+                    i.urgency
+                from filtered_by_timings_subq fbts
                 join issues i ON i.external_id = fbts.issue_id 
+                -- current status is the latest by created_at, as before the summary (which ranks by external_id)
+                cross join lateral (
+                    select sh.status
+                    from statuses_history sh
+                    where sh.issue_id = fbts.issue_id
+                    order by sh.created_at desc
+                    limit 1
+                ) last_sh
             )
 
             {select_statement}
             from last_status_filter ls_f
             where 
-                rn=1 
-                AND (:current_statuses IS NULL OR status = ANY(:current_statuses))
+                (:current_statuses IS NULL OR status = ANY(:current_statuses))
                 AND (:buildings_id IS NULL OR ls_f.building_id = ANY(:buildings_id))
                 AND (:services_id IS NULL OR ls_f.service_id = ANY(:services_id))
                 AND (:works_category_id IS NULL OR ls_f.work_category_id = ANY(:works_category_id))
@@ -329,11 +250,22 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
         self,
         params: IssueFilterDTO
     ) -> Sequence[int]:
-        stmt = self.build_filtered_issues_sql(
-            "select ls_f.issue_id",
-            "LIMIT :limit OFFSET :offset",
-            "ORDER BY ls_f.issue_id DESC",
-        )
+        if params.cursor is None:
+            stmt = self.build_filtered_issues_sql(
+                "select ls_f.issue_id",
+                "LIMIT :limit OFFSET :offset",
+                "ORDER BY ls_f.issue_id DESC",
+            )
+            page_params = {"limit": params.limit, "offset": params.limit * params.offset}
+        else:
+            # keyset page, issues after the last one of the previous page
+            stmt = self.build_filtered_issues_sql(
+                "select ls_f.issue_id",
+                "LIMIT :limit",
+                "ORDER BY ls_f.issue_id DESC",
+                "and iss.issue_id < :cursor",
+            )
+            page_params = {"limit": params.limit, "cursor": params.cursor}
         result = await self.async_session.execute(
             stmt,
             {
@@ -349,8 +281,7 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
                 "rooms_id": params.rooms_id,
                 "priorities_id": params.priorities_id,
                 "urgencies": None,
-                "limit": params.limit,
-                "offset": params.limit * params.offset
+                **page_params
             }
         )
         r = result.scalars().all()
@@ -393,66 +324,7 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
             ).cte("ChunkIDs")
         )
         
-        # Compute ranked statuses once
-        ranked_statuses_cte = (
-            select(
-                StatusHistory.issue_id,
-                StatusHistory.status,
-                func.timezone("UTC-10", StatusHistory.created_at).label("rank_created_at"),
-                func.row_number()
-                .over(partition_by=StatusHistory.issue_id, order_by=desc(StatusHistory.external_id))
-                .label("rank"),
-            )
-            # .where(StatusHistory.issue_id.in_(chunk))
-            .join(chunk_ids_cte, StatusHistory.issue_id == chunk_ids_cte.c.chunk_ids)  # Faster than WHERE IN
-            .cte("RankedStatuses")
-        )
-        # query_res: Result = await self.async_session.execute(select(ranked_statuses_cte))
-        # r1:  Sequence[Row] = query_res.all()
-
-        ranked_issues_cte = (
-            select(
-                ranked_statuses_cte.c.issue_id,
-                func.max(ranked_statuses_cte.c.rank).label("max_rank"),
-
-                func.max(
-                    Case(
-                        (ranked_statuses_cte.c.rank == 1, ranked_statuses_cte.c.status),
-                        else_=None
-                    )
-                ).label("last_status"),
-
-                func.max(
-                    Case(
-                        (ranked_statuses_cte.c.rank == 1, ranked_statuses_cte.c.rank_created_at),
-                        else_=None
-                    )
-                ).label("last_status_created"),
-
-                func.max(
-                    Case(
-                        (ranked_statuses_cte.c.rank == 2, ranked_statuses_cte.c.status),
-                        else_=None
-                    )
-                ).label("pred_status"),
-
-                func.max(
-                    Case(
-                        (ranked_statuses_cte.c.rank == 2, ranked_statuses_cte.c.rank_created_at),
-                        else_=None
-                    )
-                ).label("pred_status_created"),
-
-                func.min(
-                    ranked_statuses_cte.c.rank_created_at
-                ).label("first_status_created"),
-            )
-            .group_by(ranked_statuses_cte.c.issue_id)
-            .cte("RankedIssues")
-        )
-        # query_res: Result = await self.async_session.execute(select(ranked_issues_cte))
-        # r2:  Sequence[Row] = query_res.all()
-        # Final query joining issues with computed ranked statuses
+        # Final query joining issues with their status summary
         base_query = (
             select(
                 self.model.external_id,
@@ -467,13 +339,14 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
                 Room.title.label("room_title"),
                 Priority.title.label("prior_title"),
 
-                ranked_issues_cte.c.last_status,
-                ranked_issues_cte.c.last_status_created,
-                ranked_issues_cte.c.pred_status,
-                ranked_issues_cte.c.pred_status_created,
-                ranked_issues_cte.c.first_status_created,
+                IssueStatusSummary.last_status,
+                func.timezone("UTC-10", IssueStatusSummary.last_status_created_at).label("last_status_created"),
+                IssueStatusSummary.pred_status,
+                func.timezone("UTC-10", IssueStatusSummary.pred_status_created_at).label("pred_status_created"),
+                func.timezone("UTC-10", IssueStatusSummary.first_status_created_at).label("first_status_created"),
             )
-            .join_from(ranked_issues_cte, self.model, self.model.external_id == ranked_issues_cte.c.issue_id)
+            .join_from(chunk_ids_cte, IssueStatusSummary, IssueStatusSummary.issue_id == chunk_ids_cte.c.chunk_ids)
+            .join(self.model, self.model.external_id == IssueStatusSummary.issue_id)
             .join(Service, self.model.service_id == Service.external_id)
             .join(WorkCategory, self.model.work_category_id == WorkCategory.id)
             .join(Building, self.model.building_id == Building.id)
@@ -487,29 +360,9 @@ class IssueRepository(SQLAlchemyRepository[Issue]):
         return res
 
     async def get_last_statuses_by_id(self, issues_ids: list[int]) -> Sequence[Row[tuple[int, str]]]:
-        max_statuses_ids_cte: CTE = (
-            select(
-                StatusHistory.issue_id,
-                func.max(StatusHistory.external_id).label("latest_status_id")
-            ).
-            where(StatusHistory.issue_id.in_(issues_ids)).
-            group_by(StatusHistory.issue_id).
-            cte("latest_status_cte")
-        )
-
-        last_statuses_with_msg: CTE = (
-            select(
-                StatusHistory.issue_id,
-                StatusHistory.status
-            )
-            .join(
-                max_statuses_ids_cte, StatusHistory.external_id == max_statuses_ids_cte.c.latest_status_id
-            )
-            .cte("latest_statuses_with_message")
-        )
-
         stmt = (
-            select(last_statuses_with_msg.c.issue_id, last_statuses_with_msg.c.status)
+            select(IssueStatusSummary.issue_id, IssueStatusSummary.last_status)
+            .where(IssueStatusSummary.issue_id.in_(issues_ids))
         )
 
         query_res = await self.async_session.execute(stmt)
@@ -1,59 +1,191 @@
+from datetime import date, datetime, timezone
 from typing import Sequence
 
-from sqlalchemy import CTE, Result, Row, Select, func, select
+from loguru import logger
+from sqlalchemy import (ARRAY, INTEGER, Result, Row, Select, bindparam, func, select,
+                        text)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.issue import Issue
+from app.db.models.issue_status_summary import IssueStatusSummary
 from app.db.models.status_history import StatusHistory
 from app.repositories.abstract_repository import SQLAlchemyRepository
 
 
+REFRESH_STATUS_SUMMARY_SQL = """
+    insert into issue_status_summary (
+        issue_id, last_status_id, last_status, last_status_created_at,
+        pred_status, pred_status_created_at, first_status_created_at, transitions_count
+    )
+    select
+        issue_id,
+        max(external_id) filter (where rn = 1),
+        max(status) filter (where rn = 1),
+        max(created_at) filter (where rn = 1),
+        max(status) filter (where rn = 2),
+        max(created_at) filter (where rn = 2),
+        min(created_at),
+        count(*)
+    from (
+        select
+            issue_id,
+            external_id,
+            status,
+            created_at,
+            row_number() over (partition by issue_id order by external_id desc) as rn
+        from statuses_history
+        where issue_id = any(:issue_ids)
+    ) ranked
+    group by issue_id
+    on conflict (issue_id) do update set
+        last_status_id = excluded.last_status_id,
+        last_status = excluded.last_status,
+        last_status_created_at = excluded.last_status_created_at,
+        pred_status = excluded.pred_status,
+        pred_status_created_at = excluded.pred_status_created_at,
+        first_status_created_at = excluded.first_status_created_at,
+        transitions_count = excluded.transitions_count
+"""
+
+# statuses_history is partitioned by created_at, which has to be a part of the conflict key
+PARTITION_CONFLICT_KEY = ("external_id", "created_at")
+
+
 class StatusHistoryRepository(SQLAlchemyRepository[StatusHistory]):
     def __init__(self, async_session: AsyncSession):
         super().__init__(async_session, StatusHistory)
 
-    async def get_last_statuses_for_each_issue(self, service_id: int | None = None, filter_statuses: list[str] = []) -> Sequence[Row[tuple[int, str]]]:
+    async def prepare_rows(self, data: list[dict]) -> list[dict]:
+        """
+        One row per external_id, the last one wins: the unique key includes created_at,
+        so external_id alone is not unique in the table anymore.
+        created_at is the partition key, a missing one is taken from the stored status or set to now
+        """
+        rows = list({item["external_id"]: item for item in data}.values())
+        missing_ids = [row["external_id"] for row in rows if row.get("created_at") is None]
+        if missing_ids == []:
+            return rows
 
-        latest_status_subquery: CTE = (
-            select(
-                self.model.issue_id,
-                func.max(self.model.external_id).label("latest_id"),
-            )
-            .group_by(self.model.issue_id)
-            .cte("latest_status_subquery")
+        stored: Result = await self.async_session.execute(
+            select(self.model.external_id, func.min(self.model.created_at))
+            .where(self.model.external_id.in_(missing_ids))
+            .group_by(self.model.external_id)
         )
+        stored_created_at: dict[int, datetime] = {ext_id: created_at for ext_id, created_at in stored.all()}
+        now = datetime.now(timezone.utc)
+        return [
+            row if row.get("created_at") is not None
+            else {**row, "created_at": stored_created_at.get(row["external_id"], now)}
+            for row in rows
+        ]
 
-        filtered_by_service_issues_ids: Select = (
-            select(
-                Issue.external_id,
-                Issue.service_id
+    async def bulk_insert(self, data: list[dict]) -> int:
+        data = await self.prepare_rows(data)
+        res = await super().bulk_insert(data)
+        await self.refresh_status_summary([item["issue_id"] for item in data])
+        return res
+
+    async def bulk_update_by_external_ids(self, data: list[dict]) -> int:
+        res = await super().bulk_update_by_external_ids(data)
+        await self.refresh_status_summary([item["issue_id"] for item in data])
+        return res
+
+    async def bulk_upsert(self, data: list[dict], conflict_key: str | Sequence[str] = PARTITION_CONFLICT_KEY, *args, **kwargs) -> int:
+        data = await self.prepare_rows(data)
+        res = await super().bulk_upsert(data, conflict_key, *args, **kwargs)
+        await self.refresh_status_summary([item["issue_id"] for item in data])
+        return res
+
+    async def bulk_load(self, data: list[dict], conflict_key: str | Sequence[str] = PARTITION_CONFLICT_KEY, *args, **kwargs) -> int:
+        data = await self.prepare_rows(data)
+        res = await super().bulk_load(data, conflict_key, *args, **kwargs)
+        await self.refresh_status_summary([item["issue_id"] for item in data])
+        return res
+
+    async def refresh_status_summary(self, issue_ids: list[int]):
+        """
+        Recompute issue_status_summary rows of the touched issues
+        """
+        issue_ids = list({iss_id for iss_id in issue_ids if iss_id is not None})
+        if issue_ids == []:
+            return
+        stmt = text(REFRESH_STATUS_SUMMARY_SQL).bindparams(bindparam("issue_ids", type_=ARRAY(INTEGER)))
+        await self.async_session.execute(stmt, {"issue_ids": issue_ids})
+
+    async def create_default_partition(self):
+        """
+        Partition for the rows out of the monthly ones: old history and future-dated statuses
+        """
+        table = self.model.__tablename__
+        await self.async_session.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+    async def create_partitions(self, start: date, months: int) -> list[str]:
+        """
+        Monthly partitions from the start month, existing ones are kept.
+        Rows of a new month that already landed in the default partition are moved into it,
+        postgres refuses to create the partition otherwise. Runs in the session transaction
+        """
+        table = self.model.__tablename__
+        default_partition = f"{table}_default"
+        month_start = date(start.year, start.month, 1)
+        partitions: list[str] = []
+        for _ in range(months):
+            month_end = date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+            partition = f"{table}_p{month_start:%Y_%m}"
+            lower, upper = f"'{month_start.isoformat()} 00:00:00+00'", f"'{month_end.isoformat()} 00:00:00+00'"
+            partitions.append(partition)
+            month_start = month_end
+
+            existing: Result = await self.async_session.execute(
+                text("SELECT to_regclass(:partition) IS NOT NULL, to_regclass(:default_partition) IS NOT NULL"),
+                {"partition": partition, "default_partition": default_partition}
             )
-        ) 
+            partition_exists, default_exists = existing.one()
+            if partition_exists:
+                continue
 
-        if service_id is not None:
-            filtered_by_service_issues_ids = filtered_by_service_issues_ids.where(Issue.service_id == service_id)
-        
-        filtered_by_service_issues_ids_cte: CTE = filtered_by_service_issues_ids.cte("filtered_by_service_issues_ids")
+            rows_in_default = default_exists and (await self.async_session.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {default_partition} WHERE created_at >= {lower} AND created_at < {upper})"
+            ))).scalar()
+            if rows_in_default:
+                await self.async_session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default_partition}"))
+
+            await self.async_session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})"
+            ))
+
+            if rows_in_default:
+                moved: Result = await self.async_session.execute(text(f"""
+                    WITH moved AS (
+                        DELETE FROM {default_partition}
+                        WHERE created_at >= {lower} AND created_at < {upper}
+                        RETURNING *
+                    )
+                    INSERT INTO {table} SELECT * FROM moved
+                """))
+                await self.async_session.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default_partition} DEFAULT"))
+                logger.info(f"{moved.rowcount} rows were moved from {default_partition} to {partition}")
+        return partitions
 
-        latest_statuses_stmt = (
+    async def get_last_statuses_for_each_issue(self, service_id: int | None = None, filter_statuses: list[str] = []) -> Sequence[Row[tuple[int, str]]]:
+        latest_statuses_stmt: Select = (
             select(
-                filtered_by_service_issues_ids_cte.c.external_id,
-                self.model.status,
-            )
-            .outerjoin(
-                latest_status_subquery,
-                filtered_by_service_issues_ids_cte.c.external_id == latest_status_subquery.c.issue_id
+                Issue.external_id,
+                IssueStatusSummary.last_status,
             )
             .outerjoin(
-                self.model,
-                latest_status_subquery.c.latest_id == self.model.external_id
+                IssueStatusSummary,
+                Issue.external_id == IssueStatusSummary.issue_id
             )
         )
 
+        if service_id is not None:
+            latest_statuses_stmt = latest_statuses_stmt.where(Issue.service_id == service_id)
+
         if filter_statuses != []:
            latest_statuses_stmt = latest_statuses_stmt.where(
-                (self.model.status.is_(None)) |
-                (self.model.status.in_(filter_statuses)) 
+                (IssueStatusSummary.last_status.is_(None)) |
+                (IssueStatusSummary.last_status.in_(filter_statuses)) 
             )
 
         res: Result = await self.async_session.execute(latest_statuses_stmt)
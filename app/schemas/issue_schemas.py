@@ -1,3 +1,4 @@
+import base64
 import hashlib
 import json
 import re
@@ -174,6 +175,10 @@ class Work(BaseUserModel):
 class Pagination(BaseUserModel):
     limit: int = Field(50, ge=10, le=10000)
     offset: int = Field(0, ge=0)
+    cursor: str | None = Field(
+        None,
+        description="Cursor from the previous page, offset is ignored if it is set"
+    )
 
 
 def transition_statuses_factory() -> TransitionStatuses:
@@ -262,6 +267,30 @@ class IssuesFiltersSchema(BaseUserModel):
         hashed = hashlib.sha256(dumped.encode("utf-8")).hexdigest()
         return f"{prefix}:count_filtered_issues_{hashed}"
 
+    @staticmethod
+    def encode_cursor(filters: "IssuesFiltersSchema", last_issue_id: int) -> str:
+        """
+        Opaque cursor with the last issue id of the page and the filters hash
+        """
+        filters_hash = IssuesFiltersSchema.build_cache_key(filters)[-16:]
+        dumped = json.dumps({"id": last_issue_id, "f": filters_hash}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(dumped.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(filters: "IssuesFiltersSchema", cursor: str) -> int:
+        """
+        Last issue id from the cursor, cursors of other filters are rejected
+        """
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            last_issue_id, filters_hash = int(decoded["id"]), decoded["f"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Wrong cursor") from e
+
+        if filters_hash != IssuesFiltersSchema.build_cache_key(filters)[-16:]:
+            raise ValueError("Cursor does not match the filters")
+        return last_issue_id
+
 class FilteredIssue(BaseUserModel):
     id: int
     service_title: str
@@ -286,6 +315,7 @@ class FilteredIssuesGetSchema(BaseUserModel):
     filtered_count: int
     total_count: int
     issues: list[FilteredIssue]
+    next_cursor: str | None = None
 
 class ThinDict(BaseUserModel):
     id: int
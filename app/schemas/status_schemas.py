@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import Field
+from pydantic import Field, model_validator
 from app.schemas.general import GeneralAmeliaSchema
 
 
@@ -19,3 +19,10 @@ class HistoryStatusRecord(GeneralAmeliaSchema):
     issue_id: int | None = Field(None)
 
     updated_at: datetime | None = Field(None, validation_alias="updated_at", exclude=True)
+
+    @model_validator(mode="after")
+    def created_at_from_updated_at(self) -> "HistoryStatusRecord":
+        # created_at is the partition key of statuses_history and can't be NULL
+        if self.created_at is None:
+            self.created_at = self.updated_at
+        return self
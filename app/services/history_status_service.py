@@ -1,6 +1,9 @@
+from datetime import date
+
 from loguru import logger
 from app.schemas.status_schemas import HistoryStatusRecord, StatusPostSchema
 from app.services.services_helper import with_uow
+from app.utils.issues_cache import IssuesResponseCache
 from app.utils.unit_of_work import AbstractUnitOfWork
 
 
@@ -16,6 +19,7 @@ class HistoryStatusService():
         elements_data_for_inserting = [e.model_dump() for e in elements_post]
         try:
             await self.uow.statuses_history_repo.bulk_insert(elements_data_for_inserting)
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -24,6 +28,23 @@ class HistoryStatusService():
         logger.info(f"history statuses between {elements_post[0].external_id}-{elements_post[-1].external_id} were inserted")
         return 0
 
+    @with_uow
+    async def bulk_load(self, elements_post: list[HistoryStatusRecord]) -> int:
+        """
+        History statuses loading through COPY for backfills, already stored ones are skipped
+        """
+        elements_data_for_inserting = [e.model_dump() for e in elements_post]
+        try:
+            if await self.uow.statuses_history_repo.bulk_load(elements_data_for_inserting, update_columns=[]):
+                self.uow.after_commit(IssuesResponseCache.bump_generation)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+        
+        logger.info(f"history statuses between {elements_post[0].external_id}-{elements_post[-1].external_id} were loaded")
+        return 0
+
     @with_uow
     async def bulk_update(self, elements_update: list[HistoryStatusRecord]) -> int:
         """
@@ -32,6 +53,7 @@ class HistoryStatusService():
         elements_data_for_updating = [e.model_dump() for e in elements_update]
         try:
             await self.uow.statuses_history_repo.bulk_update_by_external_ids(elements_data_for_updating)
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -40,6 +62,22 @@ class HistoryStatusService():
         logger.info(f"history statuses between {elements_update[0].external_id}-{elements_update[-1].external_id} were updated")
         return 0                 
 
+    @with_uow
+    async def create_partitions(self, months_ahead: int) -> int:
+        """
+        Create statuses history partitions for the current and next months, and the default one
+        """
+        try:
+            await self.uow.statuses_history_repo.create_default_partition()
+            partitions = await self.uow.statuses_history_repo.create_partitions(date.today(), months_ahead + 1)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        logger.info(f"statuses history partitions {partitions[0]}-{partitions[-1]} are ready")
+        return 0
+
     @with_uow
     async def get_existing_external_ids(self, ids: list[int]) -> set[int]:
         return await self.uow.statuses_history_repo.get_existing_external_ids(ids)
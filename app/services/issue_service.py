@@ -1,12 +1,12 @@
-from functools import lru_cache
 import os
 import traceback
 from datetime import datetime, timedelta
-from typing import Sequence
+from typing import Any, Sequence
 
 from loguru import logger
 from numpy import sort
 from openpyxl import Workbook
+from pydantic_core import to_json
 from sqlalchemy import Row
 from yaml import TagToken
 
@@ -14,23 +14,81 @@ from app.celery.helpers import ShortIssue
 from app.db.models import work_category
 from app.dto.issues_filter_dto import IssueFilterDTO
 from app.dto.mappers.issue_filters_mapper import map_filters_to_dto
-from app.schemas.issue_schemas import (FilteredIssue, FilteredIssuesGetSchema,
+from app.schemas.issue_schemas import (FilteredIssuesGetSchema,
                                        IssueFilters, IssuePostSchema,
                                        IssuesFiltersSchema, ThinDict, WorkCat)
 from app.schemas.status_schemas import HistoryStatusRecord
 from app.services.services_helper import with_uow
+from app.utils.async_cache import async_cached, reference_and_issues_version
 from app.utils.benchmark import perfomance_timer
+from app.utils.issues_cache import IssuesResponseCache
 from app.utils.redis_manager import CachePrefixes, RedisManager
 from app.utils.unit_of_work import AbstractUnitOfWork
 
 from time import time
 
+
+def filtered_issue_from_row(row: Row) -> dict[str, Any]:
+    """
+    FilteredIssue fields by alias, in the order of the schema
+    """
+    end_date = close_date = None
+
+    if row.last_status == "исполнена" or row.last_status == "отказано":
+        end_date = row.last_status_created
+        close_date = None
+    elif row.pred_status == "исполнена" and row.last_status == "закрыта" :
+        end_date = row.pred_status_created
+        close_date = row.last_status_created
+
+    # compare_date = end_date if end_date else current_time
+    # if row.finish_date_plane and compare_date > row.finish_date_plane:
+    #     overdue = "просрочена"
+    # else:
+    #     overdue = ""
+
+    room_title = row.room_title.split(" ")[0] if row.room_title else ""
+
+    return {
+        "id": row.external_id,
+        "serviceTitle": row.service_title,
+        "wcTitle": row.wc_title,
+        "issDescr": row.iss_descr,
+
+        "lastStatus": row.last_status,
+
+        "createdAtFirstStat": row.first_status_created,
+        "endDate": end_date,
+        "closeDate": close_date,
+        "finishDatePlan": row.finish_date_plane,
+
+        "rating": row.rating,
+        "buildingTitle": row.building_title,
+        "roomTitle": room_title or "",
+        "workPlace": row.work_place,
+
+        "priorTitle": row.prior_title or ""
+    }
+
+
+def dump_filtered_issues(filtered_count: int, total_count: int, issues: list[dict[str, Any]], next_cursor: str | None = None) -> bytes:
+    """
+    FilteredIssuesGetSchema json, pydantic-core encodes the rows without validating them again
+    """
+    return to_json({
+        "filteredCount": filtered_count,
+        "totalCount": total_count,
+        "issues": issues,
+        "nextCursor": next_cursor
+    })
+
+
 class IssueService():
     def __init__(self,
                  uow: AbstractUnitOfWork,
-                 redis: RedisManager = RedisManager()):
+                 redis: RedisManager | None = None):
         self.uow = uow
-        self.redis = redis
+        self.redis = redis or RedisManager()
 
     @with_uow
     async def bulk_insert(self, elements_post: list[IssuePostSchema]) -> int:
@@ -40,6 +98,7 @@ class IssueService():
         elements_data_for_inserting = [e.model_dump() for e in elements_post]
         try:
             await self.uow.issues_repo.bulk_insert(elements_data_for_inserting)
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -56,6 +115,7 @@ class IssueService():
         elements_data_for_updating = [e.model_dump() for e in elements_update]
         try:
             await self.uow.issues_repo.bulk_update_by_external_ids(elements_data_for_updating)
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -64,6 +124,46 @@ class IssueService():
         logger.info(f"Issues between {elements_update[0].external_id}-{elements_update[-1].external_id} were updated")
         return 0                 
 
+    @with_uow
+    async def bulk_upsert(self, elements: list[IssuePostSchema], stats: dict[str, Any] | None = None) -> int:
+        """
+        Issues inserting or updating
+        """
+        elements_data = [e.model_dump() for e in elements]
+        try:
+            changed = await self.uow.issues_repo.bulk_upsert(elements_data)
+            if changed:
+                self.uow.after_commit(IssuesResponseCache.bump_generation)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        if stats is not None:
+            stats["changed"] += changed
+        logger.info(f"Issues between {elements[0].external_id}-{elements[-1].external_id} were upserted, changed: {changed}")
+        return 0
+
+    @with_uow
+    async def bulk_load(self, elements: list[IssuePostSchema], stats: dict[str, Any] | None = None) -> int:
+        """
+        Issues loading through COPY for backfills
+        """
+        elements_data = [e.model_dump() for e in elements]
+        try:
+            changed = await self.uow.issues_repo.bulk_load(elements_data)
+            if changed:
+                self.uow.after_commit(IssuesResponseCache.bump_generation)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        if stats is not None:
+            stats["changed"] += changed
+        logger.info(f"Issues between {elements[0].external_id}-{elements[-1].external_id} were loaded, changed: {changed}")
+        return 0
+
     @with_uow
     async def get_existing_external_ids(self, ids: list[int]) -> set[int]:
         return await self.uow.issues_repo.get_existing_external_ids(ids)
@@ -75,6 +175,7 @@ class IssueService():
         """
         try:
             await self.uow.issues_repo.bulk_delete(elements_id)
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -213,36 +314,57 @@ class IssueService():
                  
             return res_dict
 
-    @with_uow
-    @perfomance_timer
     async def get_filtered_issues(
         self,
         filters: IssuesFiltersSchema
     ) -> FilteredIssuesGetSchema:
+        return FilteredIssuesGetSchema.model_validate_json(await self.get_filtered_issues_json(filters))
+
+    @with_uow
+    @perfomance_timer
+    async def get_filtered_issues_json(
+        self,
+        filters: IssuesFiltersSchema
+    ) -> bytes:
+        """
+        Serialized response built straight from the rows, without FilteredIssue models
+        """
         try:
+            response_cache = IssuesResponseCache(self.redis)
+            generation = await response_cache.generation() or "0"
+            response_key = response_cache.build_key(generation, filters)
+            cached_response = await response_cache.get(response_key)
+            if cached_response is not None:
+                return cached_response
+
+            # cursors are bound to the filters as they were requested
+            cursor_filters = filters.model_copy(deep=True)
             if filters.transition.statuses == []:
                 filters.transition.statuses = await self.uow.statuses_history_repo.get_unique_statuses()
 
-            total_count_cache = await self.redis.get_cache(CachePrefixes.ISSUES, "total")
+            # counts belong to the same generation as the cached responses built from them
+            total_count_key = f"total:{generation}"
+            filtered_issues_count_key = f"{generation}:{IssuesFiltersSchema.build_cache_key(filters)}"
+            cached_counts = await self.redis.get_many(CachePrefixes.ISSUES, [total_count_key, filtered_issues_count_key])
+
+            total_count_cache = cached_counts[total_count_key]
             if not total_count_cache:
                 total_count: int = await self.uow.issues_repo.get_filtered_and(facility_id=2)
-                await self.redis.set_cache(CachePrefixes.ISSUES, "total", str(total_count), 600)
+                await self.redis.set_cache(CachePrefixes.ISSUES, total_count_key, str(total_count), 600)
             else:
                 total_count = int(total_count_cache)
 
-            filtered_issues_count_key = IssuesFiltersSchema.build_cache_key(filters)
             filters_dto: IssueFilterDTO = map_filters_to_dto(filters)
-            filtered_count_cache = await self.redis.get_cache(CachePrefixes.ISSUES, filtered_issues_count_key)
+            if filters.pagination.cursor is not None:
+                filters_dto.cursor = IssuesFiltersSchema.decode_cursor(cursor_filters, filters.pagination.cursor)
+            filtered_count_cache = cached_counts[filtered_issues_count_key]
             if not filtered_count_cache:
                 filtered_count: int = await self.uow.issues_repo.get_count_issues_with_filters_for_report3(
                     filters_dto
                 )
                 if filtered_count == 0:
-                    res = FilteredIssuesGetSchema(
-                        filtered_count=0,
-                        total_count=total_count,
-                        issues=[]
-                    )
+                    res = dump_filtered_issues(0, total_count, [])
+                    await response_cache.set(response_key, res)
                     return res
                 await self.redis.set_cache(CachePrefixes.ISSUES, filtered_issues_count_key, str(filtered_count), 600)
             else:
@@ -251,64 +373,23 @@ class IssueService():
             iss_ids = await self.uow.issues_repo.get_issue_ids_with_filters_for_api_ver3(
                 filters_dto
             )
-            issues: list[FilteredIssue] = []
+            next_cursor = None
+            if len(iss_ids) == filters_dto.limit:
+                next_cursor = IssuesFiltersSchema.encode_cursor(cursor_filters, iss_ids[-1])
 
             if iss_ids == [] :
-                res = FilteredIssuesGetSchema(
-                    filtered_count=filtered_count or 0,
-                    total_count=total_count,
-                    issues=issues
-                )
+                res = dump_filtered_issues(filtered_count or 0, total_count, [])
+                await response_cache.set(response_key, res)
                 return res
 
             rows = await self.uow.issues_repo.get_filtered_issues_for_report_ver4(iss_ids)
-            for row in rows:
-                end_date = close_date = None
-
-                if row.last_status == "исполнена" or row.last_status == "отказано":
-                    end_date = row.last_status_created
-                    close_date = None
-                elif row.pred_status == "исполнена" and row.last_status == "закрыта" :
-                    end_date = row.pred_status_created
-                    close_date = row.last_status_created
-
-                # compare_date = end_date if end_date else current_time
-                # logger.debug(f"{row.external_id} {row.finish_date_plane.tzinfo}, {compare_date.tzinfo}, ")
-
-                # if row.finish_date_plane and compare_date > row.finish_date_plane:
-                #     overdue = "просрочена"
-                # else:
-                #     overdue = ""
-
-                room_title = row.room_title.split(" ")[0] if row.room_title else ""
-
-                filtered_iss: FilteredIssue = FilteredIssue(
-                    id=row.external_id,
-                    service_title=row.service_title,
-                    wc_title=row.wc_title,
-                    iss_descr=row.iss_descr,
-                    
-                    last_status=row.last_status,
-
-                    created_at_first_stat=row.first_status_created,
-                    end_date=end_date,
-                    close_date=close_date,
-                    finish_date_plan=row.finish_date_plane,
-
-                    rating=row.rating,
-                    building_title=row.building_title,
-                    room_title=room_title or "",
-                    work_place=row.work_place,
-
-                    prior_title=row.prior_title or ""
-                )
-                issues.append(filtered_iss)
-
-            res = FilteredIssuesGetSchema(
-                filtered_count=filtered_count or 0,
-                total_count=total_count,
-                issues=issues
+            res = dump_filtered_issues(
+                filtered_count or 0,
+                total_count,
+                [filtered_issue_from_row(row) for row in rows],
+                next_cursor
             )
+            await response_cache.set(response_key, res)
             return res
 
         except Exception as e:
@@ -316,14 +397,15 @@ class IssueService():
             logger.error(traceback.format_exc())
             raise ValueError("Error during getting filtered issues")
 
-    @lru_cache()
+    @async_cached()
     @with_uow
     async def get_count(
         self,
     ) -> int:
         return await self.uow.issues_repo.get_count()
 
-    @lru_cache()
+    # statuses come from statuses_history, so the values also follow the issues generation
+    @async_cached(version=reference_and_issues_version)
     @with_uow
     async def get_filter_values(
         self,
@@ -349,8 +431,9 @@ class IssueService():
         statuses_dumped = [e.model_dump() for e in statuses]
 
         try:
-            await self.uow.issues_repo.bulk_insert(issues_dumped)
-            await self.uow.statuses_history_repo.bulk_insert(statuses_dumped)
+            await self.uow.issues_repo.bulk_upsert(issues_dumped)
+            await self.uow.statuses_history_repo.bulk_upsert(statuses_dumped, update_columns=[])
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -364,9 +447,10 @@ class IssueService():
         statuses_dumped = [e.model_dump() for e in statuses]
 
         try:
-            await self.uow.issues_repo.bulk_update_by_external_ids(issues_dumped)
+            await self.uow.issues_repo.bulk_upsert(issues_dumped)
             if statuses_dumped != []:
-                await self.uow.statuses_history_repo.bulk_insert(statuses_dumped)
+                await self.uow.statuses_history_repo.bulk_upsert(statuses_dumped, update_columns=[])
+            self.uow.after_commit(IssuesResponseCache.bump_generation)
             await self.uow.commit()
         except Exception as e:
             logger.error(f"Some error occurred: {e}")
@@ -134,8 +134,10 @@ class ReportService:
                 worksheet.set_column(14, 14, prior_len)
                 worksheet.set_column(15, 15, prior_len)
             workbook.close()
-            await self.redis_manager.set_cache(CachePrefixes.TASKS_INFO, f"{task_id}:status", "completed")
-            await self.redis_manager.set_cache(CachePrefixes.TASKS_INFO, f"{task_id}:file_path", output_file)
+            await self.redis_manager.set_many(
+                CachePrefixes.TASKS_INFO,
+                {f"{task_id}:status": "completed", f"{task_id}:file_path": output_file}
+            )
             logger.info(f"Report generated: {output_file}")
 
 
@@ -154,6 +156,5 @@ class ReportService:
         return file_path
 
     async def get_report_status(self, task_id: str) -> dict:
-        status = await self.redis_manager.get_cache(CachePrefixes.TASKS_INFO, f"{task_id}:status")
-        file_path = await self.redis_manager.get_cache(CachePrefixes.TASKS_INFO, f"{task_id}:file_path")
-        return {"status": status, "file_path": file_path}
+        task_info = await self.redis_manager.get_many(CachePrefixes.TASKS_INFO, [f"{task_id}:status", f"{task_id}:file_path"])
+        return {"status": task_info[f"{task_id}:status"], "file_path": task_info[f"{task_id}:file_path"]}
@@ -49,6 +49,22 @@ class RoomService():
         
         logger.info(f"Rooms between {elements_update[0].external_id}-{elements_update[-1].external_id} were updated")
         return 0                 
+
+    @with_uow
+    async def bulk_upsert(self, elements: list[RoomPostSchema]) -> int:
+        """
+        Rooms inserting or updating
+        """
+        elements_data = [e.model_dump() for e in elements]
+        try:
+            await self.uow.room_repo.bulk_upsert(elements_data)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        logger.info(f"Rooms between {elements[0].external_id}-{elements[-1].external_id} were upserted")
+        return 0
     
     @with_uow
     async def bulk_delete(self, elements_delete: list[int]) -> int:
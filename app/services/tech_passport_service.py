@@ -1,3 +1,5 @@
+from typing import Any
+
 from loguru import logger
 from app.schemas.tech_passport_schemas import TechPassportPostSchema
 from app.services.services_helper import with_uow
@@ -40,6 +42,24 @@ class TechPassportService():
         logger.info(f"Rooms between {elements_update[0].external_id}-{elements_update[-1].external_id} were updated")
         return 0
 
+    @with_uow
+    async def bulk_upsert(self, elements: list[TechPassportPostSchema], stats: dict[str, Any] | None = None) -> int:
+        """
+        Tech passports inserting or updating
+        """
+        elements_data = [e.model_dump() for e in elements]
+        try:
+            changed = await self.uow.tech_passport_repo.bulk_upsert(elements_data)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        if stats is not None:
+            stats["changed"] += changed
+        logger.info(f"Tech passports between {elements[0].external_id}-{elements[-1].external_id} were upserted, changed: {changed}")
+        return 0
+
     @with_uow
     async def get_existing_external_ids(self, ids: list[int]) -> set[int]:
         return await self.uow.tech_passport_repo.get_existing_external_ids(ids)                
@@ -40,6 +40,22 @@ class WorkCategoryService():
         logger.info(f"Services between {elements_update[0].external_id}-{elements_update[-1].external_id} were updated")
         return 0                 
 
+    @with_uow
+    async def bulk_upsert(self, elements: list[WorkCategoryPostSchema]) -> int:
+        """
+        Work categories inserting or updating
+        """
+        elements_data = [e.model_dump() for e in elements]
+        try:
+            await self.uow.work_categories_repo.bulk_upsert(elements_data)
+            await self.uow.commit()
+        except Exception as e:
+            logger.error(f"Some error occurred: {e}")
+            return 1
+
+        logger.info(f"Work categories between {elements[0].external_id}-{elements[-1].external_id} were upserted")
+        return 0
+
     @with_uow
     async def get_existing_external_ids(self, ids: list[int]) -> set[int]:
         return await self.uow.work_categories_repo.get_existing_external_ids(ids)
@@ -0,0 +1,142 @@
+import asyncio
+import inspect
+from functools import wraps
+from time import monotonic
+from typing import Any, Awaitable, Callable, get_type_hints
+
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+from redis import RedisError
+
+from app.utils.redis_manager import CachePrefixes, RedisManager
+from config import config
+
+
+class AsyncTTLCache:
+    """
+    Process-wide cache of async loaders.
+    Concurrent misses of a key share one load, entries are dropped
+    when their version changes or the ttl expires
+    """
+
+    def __init__(self, ttl: int, adapter: Callable[[], TypeAdapter] | None = None):
+        self.ttl = ttl
+        self.adapter = adapter
+        self.entries: dict[str, tuple[Any, str, float]] = {}
+        self.loading: dict[str, asyncio.Future] = {}
+
+    async def get_or_load(self, key: str, version: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] == version and entry[2] > monotonic():
+            return entry[0]
+
+        versioned_key = f"{key}:{version}"
+        if versioned_key in self.loading:
+            return await asyncio.shield(self.loading[versioned_key])
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.loading[versioned_key] = future
+        try:
+            value = await self.load(versioned_key, loader)
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self.loading.pop(versioned_key, None)
+
+        self.entries[key] = (value, version, monotonic() + self.ttl)
+        return value
+
+    async def load(self, versioned_key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.adapter is None or not config.REFERENCE_REDIS_CACHE:
+            return await loader()
+
+        adapter = self.adapter()
+        redis_manager = RedisManager()
+        try:
+            cached = await redis_manager.get_cache(CachePrefixes.REFERENCE_CACHE, versioned_key)
+            if cached is not None:
+                try:
+                    return adapter.validate_json(cached)
+                except ValidationError as e:
+                    logger.error(f"Wrong cached value of {versioned_key}: {e}")
+
+            value = await loader()
+            await redis_manager.set_cache(
+                CachePrefixes.REFERENCE_CACHE,
+                versioned_key,
+                adapter.dump_json(value).decode("utf-8"),
+                self.ttl
+            )
+            return value
+        finally:
+            await redis_manager.close()
+
+    def invalidate(self):
+        self.entries = {}
+
+
+async def reference_version() -> str:
+    redis_manager = RedisManager()
+    try:
+        return await redis_manager.get_cache(CachePrefixes.REFERENCE_VERSION) or "0"
+    finally:
+        await redis_manager.close()
+
+
+async def read_reference_and_issues_version(redis_manager: RedisManager) -> str | None:
+    """
+    Reference version with the issues generation, None if Redis is unavailable
+    """
+    try:
+        reference_version, generation = await redis_manager.get_client().mget([
+            CachePrefixes.REFERENCE_VERSION.value,
+            CachePrefixes.ISSUES_GENERATION.value
+        ])
+    except RedisError as e:
+        logger.error(f"Failed to read reference and issues versions: {e}")
+        return None
+    return f"{int(reference_version or 0)}:{int(generation or 0)}"
+
+
+async def reference_and_issues_version() -> str:
+    """
+    Version of the values built from the references and the issues data
+    """
+    redis_manager = RedisManager()
+    try:
+        return await read_reference_and_issues_version(redis_manager) or "0:0"
+    finally:
+        await redis_manager.close()
+
+
+def async_cached(
+    ttl: int = config.REFERENCE_CACHE_TTL,
+    shared: bool = True,
+    version: Callable[[], Awaitable[str]] = reference_version
+):
+    """
+    Cache results of an async method by its arguments except self.
+    With shared=True the result is also kept in Redis for other processes,
+    entries are dropped when the value of version changes
+    """
+    def decorator(func):
+        adapter: list[TypeAdapter] = []
+
+        def get_adapter() -> TypeAdapter:
+            if adapter == []:
+                adapter.append(TypeAdapter(get_type_hints(inspect.unwrap(func))["return"]))
+            return adapter[0]
+
+        cache = AsyncTTLCache(ttl, get_adapter if shared else None)
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = f"{func.__qualname__}:{args!r}:{sorted(kwargs.items())!r}"
+            return await cache.get_or_load(key, await version(), lambda: func(self, *args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,40 @@
+import hashlib
+
+from app.schemas.issue_schemas import IssuesFiltersSchema
+from app.utils.async_cache import read_reference_and_issues_version
+from app.utils.issues_cache import IssuesResponseCache
+from app.utils.redis_manager import RedisManager
+
+
+def make_etag(value: str) -> str:
+    return f'"{hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def is_not_modified(if_none_match: str | None, etag: str | None) -> bool:
+    """
+    If-None-Match uses the weak comparison, a list of tags or * is allowed
+    """
+    if if_none_match is None or etag is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+async def issues_etag(redis_manager: RedisManager, filters: IssuesFiltersSchema) -> str | None:
+    """
+    Issues generation with the filters and the page, None if the generation is unknown
+    """
+    generation = await IssuesResponseCache(redis_manager).generation()
+    if generation is None:
+        return None
+    return make_etag(IssuesResponseCache.build_key(generation, filters))
+
+
+async def filters_etag(redis_manager: RedisManager) -> str | None:
+    """
+    The same version the cached filter values are stored under, None if it is unknown
+    """
+    version = await read_reference_and_issues_version(redis_manager)
+    if version is None:
+        return None
+    return make_etag(f"filters:{version}")
@@ -0,0 +1,90 @@
+import asyncio
+from importlib.util import find_spec
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+import httpx
+from loguru import logger
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from config import config
+
+
+class HttpClientRegistry:
+    """
+    Process-wide HTTP clients for the Amelia API.
+    Async clients are bound to an event loop, so one client is kept per loop.
+    """
+
+    _async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = WeakKeyDictionary()
+    _sync_session: Session | None = None
+    _lock = Lock()
+
+    @staticmethod
+    def http2_available() -> bool:
+        return config.API_HTTP2 and find_spec("h2") is not None
+
+    @staticmethod
+    def limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=config.API_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.API_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.API_HTTP_KEEPALIVE_EXPIRY
+        )
+
+    @classmethod
+    def get_async_client(cls, timeout: float = 100) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            client = cls._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    timeout=timeout,
+                    limits=cls.limits(),
+                    http2=cls.http2_available()
+                )
+                cls._async_clients[loop] = client
+                logger.info(f"Amelia async client was created, http2: {cls.http2_available()}")
+            return client
+
+    @classmethod
+    def get_sync_session(cls) -> Session:
+        with cls._lock:
+            if cls._sync_session is None:
+                session = Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.API_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    pool_maxsize=config.API_HTTP_MAX_CONNECTIONS
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._sync_session = session
+            return cls._sync_session
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close every client, called on worker shutdown
+        """
+        with cls._lock:
+            clients = list(cls._async_clients.items())
+            cls._async_clients.clear()
+            session, cls._sync_session = cls._sync_session, None
+
+        for loop, client in clients:
+            if client.is_closed:
+                continue
+            try:
+                if loop.is_closed():
+                    continue
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                else:
+                    loop.run_until_complete(client.aclose())
+            except Exception as e:
+                logger.error(f"Failed to close Amelia async client: {e}")
+
+        if session is not None:
+            session.close()
+        logger.info("Amelia http clients were closed")
@@ -0,0 +1,61 @@
+from loguru import logger
+from redis import RedisError
+
+from app.schemas.issue_schemas import IssuesFiltersSchema
+from app.utils.redis_manager import CachePrefixes, RedisManager
+from config import config
+
+
+class IssuesResponseCache:
+    """
+    Serialized GET /issues response bodies of the current issues generation.
+    The generation is bumped after every commit of the issues sync,
+    so cached pages live until new data lands
+    """
+
+    def __init__(self, redis_manager: RedisManager):
+        self.redis_manager = redis_manager
+
+    @staticmethod
+    async def bump_generation() -> int | None:
+        redis_manager = RedisManager()
+        try:
+            return await redis_manager.get_client().incr(CachePrefixes.ISSUES_GENERATION.value)
+        except RedisError as e:
+            logger.error(f"Failed to bump issues generation: {e}")
+            return None
+        finally:
+            await redis_manager.close()
+
+    async def generation(self) -> str | None:
+        """
+        Current issues generation, None if Redis is unavailable
+        """
+        try:
+            generation = await self.redis_manager.get_client().get(CachePrefixes.ISSUES_GENERATION.value)
+        except RedisError as e:
+            logger.error(f"Failed to read issues generation: {e}")
+            return None
+        return generation.decode("utf-8") if generation is not None else "0"
+
+    @staticmethod
+    def build_key(generation: str, filters: IssuesFiltersSchema) -> str:
+        filters_hash = IssuesFiltersSchema.build_cache_key(filters)[-32:]
+        pagination = filters.pagination
+        return f"{generation}:{filters_hash}:{pagination.limit}:{pagination.offset}:{pagination.cursor or ''}"
+
+    async def get(self, key: str) -> bytes | None:
+        if not config.ISSUES_RESPONSE_CACHE:
+            return None
+        cached = await self.redis_manager.get_cache(CachePrefixes.ISSUES_RESPONSE, key)
+        return cached.encode("utf-8") if cached is not None else None
+
+    async def set(self, key: str, content: bytes):
+        if not config.ISSUES_RESPONSE_CACHE:
+            return
+        await self.redis_manager.set_cache(
+            CachePrefixes.ISSUES_RESPONSE,
+            key,
+            content.decode("utf-8"),
+            config.ISSUES_RESPONSE_CACHE_TTL
+        )
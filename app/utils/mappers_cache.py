@@ -0,0 +1,128 @@
+import json
+from time import monotonic
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+from redis import RedisError
+
+from app.utils.redis_manager import CachePrefixes, RedisManager, get_sync_redis_client
+from app.utils.unit_of_work import AbstractUnitOfWork
+from config import config
+
+
+class ReferenceVersion:
+    """
+    Counter of reference data changes, bumped by the reference sync tasks
+    """
+
+    @staticmethod
+    def get() -> int | None:
+        try:
+            version = get_sync_redis_client().get(CachePrefixes.REFERENCE_VERSION.value)
+            return int(version) if version is not None else 0
+        except RedisError as e:
+            logger.error(f"Failed to read reference version: {e}")
+            return None
+
+    @staticmethod
+    async def get_async(redis_manager: RedisManager) -> int | None:
+        try:
+            version = await redis_manager.get_client().get(CachePrefixes.REFERENCE_VERSION.value)
+            return int(version) if version is not None else 0
+        except RedisError as e:
+            logger.error(f"Failed to read reference version: {e}")
+            return None
+
+    @staticmethod
+    def bump() -> int | None:
+        try:
+            return get_sync_redis_client().incr(CachePrefixes.REFERENCE_VERSION.value)
+        except RedisError as e:
+            logger.error(f"Failed to bump reference version: {e}")
+            return None
+
+
+def encode_mappers(value: Any) -> Any:
+    """
+    Mappers contain int keys and sets, keep their types in json
+    """
+    if isinstance(value, dict):
+        return {"__dict__": [[k, encode_mappers(v)] for k, v in value.items()]}
+    if isinstance(value, set):
+        return {"__set__": list(value)}
+    return value
+
+
+def decode_mappers(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "__set__" in value:
+            return set(value["__set__"])
+        return {k: decode_mappers(v) for k, v in value["__dict__"]}
+    return value
+
+
+class MappersCache:
+    """
+    Reference mappers held in process and optionally shared through Redis.
+    They are reloaded only when the reference version changes.
+    """
+
+    _mappers: dict[str, Any] | None = None
+    _version: int | None = None
+    _loaded_at: float = 0
+
+    @classmethod
+    def is_valid(cls, version: int | None) -> bool:
+        return (
+            cls._mappers is not None
+            and version is not None
+            and cls._version == version
+            and monotonic() - cls._loaded_at < config.MAPPERS_CACHE_TTL
+        )
+
+    @classmethod
+    async def _from_redis(cls, redis_manager: RedisManager, version: int) -> dict[str, Any] | None:
+        try:
+            cached = await redis_manager.get_client().get(f"{CachePrefixes.MAPPERS.value}:{version}")
+            return decode_mappers(json.loads(cached)) if cached is not None else None
+        except (RedisError, ValueError, KeyError) as e:
+            logger.error(f"Failed to read mappers from cache: {e}")
+            return None
+
+    @classmethod
+    async def _to_redis(cls, redis_manager: RedisManager, version: int, mappers: dict[str, Any]):
+        try:
+            await redis_manager.get_client().set(
+                f"{CachePrefixes.MAPPERS.value}:{version}",
+                json.dumps(encode_mappers(mappers)),
+                ex=config.MAPPERS_CACHE_TTL
+            )
+        except RedisError as e:
+            logger.error(f"Failed to store mappers in cache: {e}")
+
+    @classmethod
+    async def get(cls, uow: AbstractUnitOfWork, loader: Callable[[AbstractUnitOfWork], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        redis_manager = RedisManager()
+        try:
+            version = await ReferenceVersion.get_async(redis_manager)
+            if cls.is_valid(version):
+                return cls._mappers  # type: ignore[return-value]
+
+            mappers = None
+            if version is not None and config.MAPPERS_REDIS_CACHE:
+                mappers = await cls._from_redis(redis_manager, version)
+
+            if mappers is None:
+                mappers = await loader(uow)
+                logger.info(f"Mappers were loaded, reference version: {version}")
+                if version is not None and config.MAPPERS_REDIS_CACHE:
+                    await cls._to_redis(redis_manager, version, mappers)
+        finally:
+            await redis_manager.close()
+
+        cls._mappers, cls._version, cls._loaded_at = mappers, version, monotonic()
+        return mappers
+
+    @classmethod
+    def invalidate(cls):
+        cls._mappers = None
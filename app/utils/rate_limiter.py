@@ -0,0 +1,119 @@
+import asyncio
+from threading import Lock
+from time import monotonic, sleep, time
+
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.utils.redis_manager import CachePrefixes, RedisManager, get_sync_redis_client
+from config import config
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket limiter, rate is set in requests per second.
+    Slots are reserved under a thread lock, so one limiter serves
+    every client, event loop and thread of the process
+    """
+
+    _shared: dict[tuple[str, float], "TokenBucketRateLimiter"] = {}
+    _shared_lock = Lock()
+
+    def __init__(self, rate: float = config.API_CALLS_RATE_LIMIT, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._next_slot = monotonic()
+        self._lock = Lock()
+
+    @classmethod
+    def shared(cls, name: str, rate: float = config.API_CALLS_RATE_LIMIT) -> "TokenBucketRateLimiter":
+        """
+        Process-wide limiter of an API, every client of the API with the same rate takes slots from it.
+        The rate is fixed by the configuration, clients can't change it for each other
+        """
+        with cls._shared_lock:
+            if (name, rate) not in cls._shared:
+                cls._shared[(name, rate)] = cls(rate)
+            return cls._shared[(name, rate)]
+
+    def reserve(self) -> float:
+        """
+        Take the next free slot, returns time to wait for it
+        """
+        with self._lock:
+            if self.rate <= 0:
+                return 0
+            now = monotonic()
+            interval = 1 / self.rate
+            # unused slots are kept up to the capacity
+            self._next_slot = max(self._next_slot, now - (self.capacity - 1) * interval)
+            wait = self._next_slot - now
+            self._next_slot += interval
+            return max(wait, 0)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RedisRateLimiter:
+    """
+    Requests per second budget shared by every worker through Redis
+    """
+
+    def __init__(self, rate: int = config.API_CALLS_GLOBAL_RATE_LIMIT, redis_client: StrictRedis | None = None):
+        self.rate = rate
+        self.redis_client = redis_client or get_sync_redis_client()
+        self.key = CachePrefixes.API_RATE_LIMIT.value
+
+    def _try_acquire(self) -> float:
+        """
+        Take a slot in the current second, returns time to wait if the budget is spent
+        """
+        now = time()
+        window = int(now)
+        key = f"{self.key}:{window}"
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 2)
+                count, _ = pipe.execute()
+        except RedisError as e:
+            logger.error(f"Global rate limiter is unavailable: {e}")
+            return 0
+        if count <= self.rate:
+            return 0
+        return window + 1 - now
+
+    async def _try_acquire_async(self, redis_manager: RedisManager) -> float:
+        now = time()
+        window = int(now)
+        key = f"{self.key}:{window}"
+        try:
+            async with redis_manager.get_client().pipeline() as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 2)
+                count, _ = await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Global rate limiter is unavailable: {e}")
+            return 0
+        if count <= self.rate:
+            return 0
+        return window + 1 - now
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._try_acquire()) > 0:
+            sleep(wait)
+
+    async def acquire_async(self):
+        if self.rate <= 0:
+            return
+        redis_manager = RedisManager()
+        try:
+            while (wait := await self._try_acquire_async(redis_manager)) > 0:
+                await asyncio.sleep(wait)
+        finally:
+            await redis_manager.close()
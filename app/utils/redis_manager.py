@@ -1,7 +1,12 @@
+import asyncio
 from enum import Enum
+from functools import lru_cache
+from threading import Lock
+from weakref import WeakKeyDictionary
 
 from loguru import logger
 from redis import RedisError, StrictRedis
+from redis.asyncio import ConnectionPool, Redis
 
 from config import config
 
@@ -11,48 +16,175 @@ class CachePrefixes(Enum):
     TASKS_INFO = "TASKS_INFO"
     CELERY_TASK_DYNAMIC_ISSUES = "CELERY_TASK_DYNAMIC_ISSUES"
     ISSUES = "ISSUES"
+    AMELIA_TOKEN = "AMELIA_TOKEN"
+    DYNAMIC_ISSUES_HWM = "DYNAMIC_ISSUES_HWM"
+    SYNC_CHECKPOINTS = "SYNC_CHECKPOINTS"
+    API_RATE_LIMIT = "API_RATE_LIMIT"
+    REFERENCE_VERSION = "REFERENCE_VERSION"
+    MAPPERS = "MAPPERS"
+    RESPONSE_CACHE = "RESPONSE_CACHE"
+    ISSUES_GENERATION = "ISSUES_GENERATION"
+    ISSUES_RESPONSE = "ISSUES_RESPONSE_JSON"
+    REFERENCE_CACHE = "REFERENCE_CACHE"
+
+
+@lru_cache
+def get_sync_redis_client() -> StrictRedis:
+    """
+    Process-wide client for worker-side coordination
+    """
+    return StrictRedis(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        db=config.REDIS_DB
+    )
+
+
+shared_pool: ConnectionPool | None = None
+
+
+def init_redis_pool() -> ConnectionPool:
+    """
+    One connection pool for all RedisManager instances of the API process,
+    created in the FastAPI lifespan
+    """
+    global shared_pool
+    if shared_pool is None:
+        shared_pool = ConnectionPool(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            max_connections=config.REDIS_MAX_CONNECTIONS
+        )
+    return shared_pool
+
+
+async def close_redis_pool():
+    global shared_pool
+    if shared_pool is not None:
+        await shared_pool.disconnect()
+        shared_pool = None
+
+
+class LoopPoolRegistry:
+    """
+    Workers have no lifespan and run tasks on long-lived event loops,
+    so one pool is kept per loop like the Amelia http clients
+    """
+
+    _pools: WeakKeyDictionary[asyncio.AbstractEventLoop, ConnectionPool] = WeakKeyDictionary()
+    _lock = Lock()
+
+    @classmethod
+    def get_pool(cls) -> ConnectionPool | None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        with cls._lock:
+            pool = cls._pools.get(loop)
+            if pool is None:
+                pool = ConnectionPool(
+                    host=config.REDIS_HOST,
+                    port=config.REDIS_PORT,
+                    db=config.REDIS_DB,
+                    max_connections=config.REDIS_MAX_CONNECTIONS
+                )
+                cls._pools[loop] = pool
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        """
+        Disconnect every pool, called on worker shutdown
+        """
+        with cls._lock:
+            pools = list(cls._pools.items())
+            cls._pools.clear()
+
+        for loop, pool in pools:
+            try:
+                if loop.is_closed():
+                    continue
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(pool.disconnect(), loop)
+                else:
+                    loop.run_until_complete(pool.disconnect())
+            except Exception as e:
+                logger.error(f"Failed to close redis pool: {e}")
 
 
 class RedisManager:
+    """
+    Async client on the shared pool of the API or the pool of the worker event loop
+    """
+
     def __init__(self):
-        self.redis_client: StrictRedis = StrictRedis(
-            host=config.REDIS_HOST, 
-            port=config.REDIS_PORT, 
-            db=config.REDIS_DB
-        )
+        pool = shared_pool or LoopPoolRegistry.get_pool()
+        self.owns_pool = pool is None
+        if pool is not None:
+            self.redis_client: Redis = Redis(connection_pool=pool)
+        else:
+            self.redis_client = Redis(
+                host=config.REDIS_HOST, 
+                port=config.REDIS_PORT, 
+                db=config.REDIS_DB
+            )
 
-    def get_client(self):
+    def get_client(self) -> Redis:
         return self.redis_client
 
-    def close(self):
-        self.redis_client.close()
+    async def close(self):
+        await self.redis_client.aclose(close_connection_pool=self.owns_pool)
+
+    @staticmethod
+    def full_key(prefix: CachePrefixes, key: str | None = None) -> str:
+        return f"{prefix.value}:{key}" if key else prefix.value
 
     async def set_cache(self, prefix: CachePrefixes, key: str | None = None,  val: str = "", timeout: int | None = None):
         try:
-            if key:
-                full_key = f"{prefix.value}:{key}"
-            else:
-                full_key = prefix.value
+            full_key = self.full_key(prefix, key)
 
             logger.info(f"Cache was updated for prefix: {full_key}")
-            with self.redis_client.pipeline() as pipe:
-                pipe.set(full_key, val)
-                if timeout is not None:
-                    pipe.expire(full_key, timeout)
-                pipe.execute()
-
-                return True
+            await self.redis_client.set(full_key, val, ex=timeout)
+            return True
         except RedisError as e:
-            logger.error("Failed update cache for preifx '{prefix}': {e}")
+            logger.error(f"Failed update cache for preifx '{prefix}': {e}")
             return False
 
     async def get_cache(self, prefix: CachePrefixes, key: str | None = None) -> str | None:
         try:
-            full_key = f"{prefix.value}:{key}" if key else prefix.value
-            result = self.redis_client.get(full_key)
+            result = await self.redis_client.get(self.full_key(prefix, key))
             return result.decode('utf-8') if result else None
         except RedisError as e:
             logger.error(f"Failed to retrieve cache for prefix '{prefix!r}', key {key!r}: {e}")
             return None
 
+    async def get_many(self, prefix: CachePrefixes, keys: list[str]) -> dict[str, str | None]:
+        """
+        Values of several keys in one round trip
+        """
+        if keys == []:
+            return {}
+        try:
+            results = await self.redis_client.mget([self.full_key(prefix, key) for key in keys])
+        except RedisError as e:
+            logger.error(f"Failed to retrieve cache for prefix '{prefix!r}', keys {keys!r}: {e}")
+            return {key: None for key in keys}
+        return {key: result.decode('utf-8') if result else None for key, result in zip(keys, results)}
 
+    async def set_many(self, prefix: CachePrefixes, values: dict[str, str], timeout: int | None = None) -> bool:
+        """
+        Several keys in one pipelined round trip
+        """
+        if values == {}:
+            return True
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, val in values.items():
+                    pipe.set(self.full_key(prefix, key), val, ex=timeout)
+                await pipe.execute()
+            return True
+        except RedisError as e:
+            logger.error(f"Failed update cache for preifx '{prefix}': {e}")
+            return False
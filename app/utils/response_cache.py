@@ -0,0 +1,80 @@
+import hashlib
+import json
+from typing import Mapping
+
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.utils.redis_manager import CachePrefixes, get_sync_redis_client
+from config import config
+
+
+class ResponseCache:
+    """
+    Validators and content hashes of reference grid pages.
+    A page is remembered only after it was written to the database,
+    so a failed sync downloads it again on the next run.
+    """
+
+    def __init__(self, redis_client: StrictRedis | None = None, prefix: CachePrefixes = CachePrefixes.RESPONSE_CACHE):
+        self.redis_client = redis_client or get_sync_redis_client()
+        self.prefix = prefix.value
+
+    def key(self, url: str) -> str:
+        return f"{self.prefix}:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, url: str) -> dict[str, str]:
+        try:
+            entry = self.redis_client.hgetall(self.key(url))
+        except RedisError as e:
+            logger.error(f"Failed to read response cache: {e}")
+            return {}
+        return {field.decode("utf-8"): value.decode("utf-8") for field, value in entry.items()}
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """
+        If-None-Match / If-Modified-Since from the remembered page
+        """
+        entry = self.get(url)
+        headers: dict[str, str] = {}
+        if "hash" not in entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url: str, status_code: int, content: bytes) -> bool:
+        """
+        Not modified response or the same content as the remembered page
+        """
+        entry = self.get(url)
+        if "hash" not in entry:
+            return False
+        return status_code == 304 or entry["hash"] == self.content_hash(content)
+
+    def store(self, url: str, headers: Mapping[str, str], content: bytes, ids: list[int] | None = None):
+        """
+        Remember the page with the external ids it contains
+        """
+        entry = {
+            "hash": self.content_hash(content),
+            "etag": headers.get("etag", ""),
+            "last_modified": headers.get("last-modified", ""),
+            "ids": json.dumps(ids or [])
+        }
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.hset(self.key(url), mapping=entry)
+                pipe.expire(self.key(url), config.API_RESPONSE_CACHE_TTL)
+                pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to store response cache: {e}")
+
+    def ids(self, url: str) -> list[int]:
+        return json.loads(self.get(url).get("ids", "[]"))
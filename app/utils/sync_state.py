@@ -0,0 +1,128 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable
+
+from loguru import logger
+from redis import RedisError
+
+from app.utils.redis_manager import CachePrefixes, RedisManager
+from config import config
+
+
+AMELIA_TIME_ZONE = timezone(timedelta(hours=10))
+CHECKPOINT_DONE = -1
+
+
+class SyncStateManager:
+    """
+    Progress of sync tasks kept in Redis
+    """
+
+    def __init__(self, redis_manager: RedisManager | None = None):
+        self.redis_manager = redis_manager or RedisManager()
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(AMELIA_TIME_ZONE)
+
+    async def get_high_water_mark(self, facility_id: int) -> datetime | None:
+        """
+        Start time of the last successful dynamic issues sync
+        """
+        mark = await self.redis_manager.get_cache(CachePrefixes.DYNAMIC_ISSUES_HWM, str(facility_id))
+        if mark is None:
+            return None
+        try:
+            return datetime.fromisoformat(mark)
+        except ValueError:
+            logger.error(f"Wrong high-water mark for facility {facility_id}: {mark}")
+            return None
+
+    async def set_high_water_mark(self, facility_id: int, mark: datetime) -> bool:
+        return await self.redis_manager.set_cache(
+            CachePrefixes.DYNAMIC_ISSUES_HWM,
+            str(facility_id),
+            mark.isoformat(timespec="seconds")
+        )
+
+    async def reset_high_water_mark(self, facility_id: int):
+        await self.redis_manager.get_client().delete(f"{CachePrefixes.DYNAMIC_ISSUES_HWM.value}:{facility_id}")
+
+    async def delta_time_range(self, facility_id: int, overlap_minutes: int = config.DYNAMIC_ISSUES_OVERLAP_MINUTES) -> list[str]:
+        """
+        Time range since the high-water mark with overlap, empty if there is no mark
+        """
+        mark = await self.get_high_water_mark(facility_id)
+        if mark is None:
+            return []
+
+        start_date = (mark - timedelta(minutes=overlap_minutes)).isoformat(timespec="seconds")
+        end_date = (date.today() + timedelta(days=5)).strftime("%Y-%m-%dT%H:%M:%S") + "+10:00"
+        return [start_date, end_date]
+
+    @staticmethod
+    def checkpoint_field(service_id: int, borders: dict[str, int] | None = None) -> str:
+        if borders is None:
+            return str(service_id)
+        return f"{service_id}:{borders['start']}-{borders['end']}"
+
+    def checkpoints_key(self, task_name: str) -> str:
+        return f"{CachePrefixes.SYNC_CHECKPOINTS.value}:{task_name}"
+
+    def handed_off_key(self, task_name: str, field: str) -> str:
+        return f"{self.checkpoints_key(task_name)}:handed_off:{field}"
+
+    async def get_checkpoint(self, task_name: str, service_id: int, borders: dict[str, int] | None = None) -> int | None:
+        """
+        Last flushed page of the service, CHECKPOINT_DONE if the service is finished
+        """
+        try:
+            page = await self.redis_manager.get_client().hget(self.checkpoints_key(task_name), self.checkpoint_field(service_id, borders))
+            return int(page) if page is not None else None
+        except RedisError as e:
+            logger.error(f"Failed to read checkpoint of {task_name}, service {service_id}: {e}")
+            return None
+
+    async def save_checkpoint(self, task_name: str, service_id: int, page: int, borders: dict[str, int] | None = None, handed_off_ids: Iterable[int] = ()):
+        """
+        Checkpoints live SYNC_CHECKPOINTS_TTL after the last save, so markers of a crashed run expire.
+        Ids handled up to the page are kept with it for the resumed run
+        """
+        field = self.checkpoint_field(service_id, borders)
+        handed_off_ids = list(handed_off_ids)
+        try:
+            async with self.redis_manager.get_client().pipeline() as pipe:
+                pipe.hset(self.checkpoints_key(task_name), field, page)
+                pipe.expire(self.checkpoints_key(task_name), config.SYNC_CHECKPOINTS_TTL)
+                if handed_off_ids != []:
+                    pipe.sadd(self.handed_off_key(task_name, field), *handed_off_ids)
+                    pipe.expire(self.handed_off_key(task_name, field), config.SYNC_CHECKPOINTS_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to save checkpoint of {task_name}, service {service_id}: {e}")
+
+    async def get_handed_off_ids(self, task_name: str, service_id: int, borders: dict[str, int] | None = None) -> set[int]:
+        try:
+            ids = await self.redis_manager.get_client().smembers(self.handed_off_key(task_name, self.checkpoint_field(service_id, borders)))
+        except RedisError as e:
+            logger.error(f"Failed to read handled ids of {task_name}, service {service_id}: {e}")
+            return set()
+        return {int(iss_id) for iss_id in ids}
+
+    async def get_checkpoints(self, task_name: str) -> dict[str, int]:
+        checkpoints = await self.redis_manager.get_client().hgetall(self.checkpoints_key(task_name))
+        return {field.decode("utf-8"): int(page) for field, page in checkpoints.items()}
+
+    async def reset_checkpoints(self, task_name: str, fields: list[str] | None = None):
+        """
+        Remove checkpoints of the task, all of them if fields are not set
+        """
+        client = self.redis_manager.get_client()
+        try:
+            if fields is None:
+                handed_off_keys = [key async for key in client.scan_iter(match=self.handed_off_key(task_name, "*"))]
+                await client.delete(self.checkpoints_key(task_name), *handed_off_keys)
+            elif fields != []:
+                await client.hdel(self.checkpoints_key(task_name), *fields)
+                await client.delete(*[self.handed_off_key(task_name, field) for field in fields])
+        except RedisError as e:
+            logger.error(f"Failed to reset checkpoints of {task_name}: {e}")
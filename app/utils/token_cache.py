@@ -0,0 +1,196 @@
+import asyncio
+from time import sleep, time
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+import jwt
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.utils.redis_manager import CachePrefixes, RedisManager, get_sync_redis_client
+from config import config
+
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class TokenCache:
+    """
+    Amelia bearer token shared by every worker through Redis.
+    Only one worker logs in at a time, the others wait for its token.
+    """
+
+    def __init__(self, redis_client: StrictRedis | None = None, prefix: CachePrefixes = CachePrefixes.AMELIA_TOKEN):
+        self.redis_client = redis_client or get_sync_redis_client()
+        self.key = prefix.value
+        self.lock_key = f"{prefix.value}:lock"
+
+    @staticmethod
+    def get_expires_at(token: str) -> float:
+        """
+        Read expiry from the token, fallback to the configured ttl
+        """
+        try:
+            payload = jwt.decode(token, options={"verify_signature": False})
+            return float(payload["exp"])
+        except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+            return time() + config.API_TOKEN_TTL
+
+    @staticmethod
+    def is_fresh(expires_at: float) -> bool:
+        return expires_at - config.API_TOKEN_REFRESH_MARGIN > time()
+
+    def parse(self, token: bytes | None, expires_at: bytes | None, stale: str | None) -> tuple[str, float] | None:
+        if token is None or expires_at is None:
+            return None
+
+        decoded = token.decode("utf-8")
+        if decoded == stale or not self.is_fresh(float(expires_at)):
+            return None
+        return decoded, float(expires_at)
+
+    def get(self, stale: str | None = None) -> tuple[str, float] | None:
+        """
+        Cached token with its expiry, skips the stale one and tokens close to expiry
+        """
+        try:
+            token, expires_at = self.redis_client.hmget(self.key, "token", "expires_at")
+        except RedisError as e:
+            logger.error(f"Failed to read amelia token: {e}")
+            return None
+        return self.parse(token, expires_at, stale)
+
+    async def get_async(self, stale: str | None = None) -> tuple[str, float] | None:
+        redis_manager = RedisManager()
+        try:
+            token, expires_at = await redis_manager.get_client().hmget(self.key, "token", "expires_at")
+        except RedisError as e:
+            logger.error(f"Failed to read amelia token: {e}")
+            return None
+        finally:
+            await redis_manager.close()
+        return self.parse(token, expires_at, stale)
+
+    def set(self, token: str) -> float:
+        expires_at = self.get_expires_at(token)
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.hset(self.key, mapping={"token": token, "expires_at": expires_at})
+                pipe.expireat(self.key, int(expires_at))
+                pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to store amelia token: {e}")
+        return expires_at
+
+    async def set_async(self, token: str) -> float:
+        expires_at = self.get_expires_at(token)
+        redis_manager = RedisManager()
+        try:
+            async with redis_manager.get_client().pipeline() as pipe:
+                pipe.hset(self.key, mapping={"token": token, "expires_at": expires_at})
+                pipe.expireat(self.key, int(expires_at))
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to store amelia token: {e}")
+        finally:
+            await redis_manager.close()
+        return expires_at
+
+    def _acquire_lock(self) -> str | None:
+        owner = uuid4().hex
+        try:
+            if self.redis_client.set(self.lock_key, owner, nx=True, ex=config.API_TOKEN_LOCK_TIMEOUT):
+                return owner
+            return None
+        except RedisError as e:
+            logger.error(f"Failed to lock amelia token refresh: {e}")
+            return owner
+
+    def _release_lock(self, owner: str):
+        try:
+            self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, owner)
+        except RedisError as e:
+            logger.error(f"Failed to unlock amelia token refresh: {e}")
+
+    async def _acquire_lock_async(self) -> str | None:
+        owner = uuid4().hex
+        redis_manager = RedisManager()
+        try:
+            if await redis_manager.get_client().set(self.lock_key, owner, nx=True, ex=config.API_TOKEN_LOCK_TIMEOUT):
+                return owner
+            return None
+        except RedisError as e:
+            logger.error(f"Failed to lock amelia token refresh: {e}")
+            return owner
+        finally:
+            await redis_manager.close()
+
+    async def _release_lock_async(self, owner: str):
+        redis_manager = RedisManager()
+        try:
+            await redis_manager.get_client().eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, owner)
+        except RedisError as e:
+            logger.error(f"Failed to unlock amelia token refresh: {e}")
+        finally:
+            await redis_manager.close()
+
+    def refresh(self, login: Callable[[], str | None], stale: str | None = None) -> tuple[str, float] | None:
+        """
+        Login under the lock, or wait until another worker stores a new token
+        """
+        deadline = time() + config.API_TOKEN_LOCK_TIMEOUT
+        owner = None
+        while owner is None and time() < deadline:
+            cached = self.get(stale)
+            if cached is not None:
+                return cached
+            owner = self._acquire_lock()
+            if owner is None:
+                sleep(0.5)
+
+        try:
+            cached = self.get(stale)
+            if cached is not None:
+                return cached
+
+            token = login()
+            if token is None:
+                return None
+            logger.info("Amelia token was refreshed")
+            return token, self.set(token)
+        finally:
+            if owner is not None:
+                self._release_lock(owner)
+
+    async def refresh_async(self, login: Callable[[], Awaitable[str | None]], stale: str | None = None) -> tuple[str, float] | None:
+        """
+        Async version of refresh on the async redis client
+        """
+        deadline = time() + config.API_TOKEN_LOCK_TIMEOUT
+        owner = None
+        while owner is None and time() < deadline:
+            cached = await self.get_async(stale)
+            if cached is not None:
+                return cached
+            owner = await self._acquire_lock_async()
+            if owner is None:
+                await asyncio.sleep(0.5)
+
+        try:
+            cached = await self.get_async(stale)
+            if cached is not None:
+                return cached
+
+            token = await login()
+            if token is None:
+                return None
+            logger.info("Amelia token was refreshed")
+            return token, await self.set_async(token)
+        finally:
+            if owner is not None:
+                await self._release_lock_async(owner)
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
+from inspect import isawaitable
+from typing import Any, Callable
 
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import db
+from app.db import db, get_database, get_replica
 from app.repositories import (BuildingRepository, CompanyRepository,
                               FacilityRepository, FloorRepository,
                               IssueRepository, PriorityRepository,
@@ -61,42 +63,120 @@ class AbstractUnitOfWork(ABC):
     async def rollback(self):
         raise NotImplementedError
 
+    @abstractmethod
+    def after_commit(self, hook: Callable[[], Any]):
+        raise NotImplementedError
+
 
 class SqlAlchemyUnitOfWork(AbstractUnitOfWork):
+    """
+    Reentrant unit of work: nested blocks join the outer session,
+    only the outermost block commits, rolls back and closes it.
+    Repositories are created on first access
+    """
+
+    repositories: dict[str, type] = {
+        "service_repo": ServiceRepository,
+        "buildings_repo": BuildingRepository,
+        "company_repo": CompanyRepository,
+        "facility_repo": FacilityRepository,
+        "floor_repo": FloorRepository,
+        "issues_repo": IssueRepository,
+        "priority_repo": PriorityRepository,
+        "room_repo": RoomRepository,
+        "status_repo": StatusRepository,
+        "statuses_history_repo": StatusHistoryRepository,
+        "users_repo": UserRepository,
+        "work_categories_repo": WorkCategoryRepository,
+        "workflow_repo": WorkflowRepository,
+        "tech_passport_repo": TechPassportRepository,
+
+        "system_user_repo": SystemUserRepository,
+        "role_repo": RoleRepository,
+        "permission_repo": PermissionRepository,
+        "role_permission_repo": RolePermissionRepository,
+    }
     
-    def __init__(self):
-        self.async_session_factory = db.get_async_sessionmaker()
+    def __init__(self, role: str | None = None):
+        database = db if role is None else get_database(role)
+        self.async_session_factory = database.get_async_sessionmaker()
+        self.depth = 0
+        self.after_commit_hooks: list[Callable[[], Any]] = []
+
+    def __getattr__(self, name: str):
+        repository = type(self).repositories.get(name)
+        if repository is None or self.__dict__.get("depth", 0) == 0:
+            raise AttributeError(name)
+        repo = repository(self.async_session)
+        setattr(self, name, repo)
+        return repo
+
+    @property
+    def is_nested(self) -> bool:
+        return self.depth > 1
 
     async def __aenter__(self):
-        self.async_session: AsyncSession = self.async_session_factory()
-
-        self.service_repo = ServiceRepository(self.async_session)
-        self.buildings_repo = BuildingRepository(self.async_session)
-        self.company_repo = CompanyRepository(self.async_session)
-        self.facility_repo = FacilityRepository(self.async_session)
-        self.floor_repo = FloorRepository(self.async_session)
-        self.issues_repo = IssueRepository(self.async_session)
-        self.priority_repo = PriorityRepository(self.async_session)
-        self.room_repo = RoomRepository(self.async_session)
-        self.status_repo = StatusRepository(self.async_session)
-        self.statuses_history_repo = StatusHistoryRepository(self.async_session)
-        self.users_repo = UserRepository(self.async_session)
-        self.work_categories_repo = WorkCategoryRepository(self.async_session)
-        self.workflow_repo = WorkflowRepository(self.async_session)
-        self.tech_passport_repo = TechPassportRepository(self.async_session)
-
-        self.system_user_repo = SystemUserRepository(self.async_session)
-        self.role_repo = RoleRepository(self.async_session)
-        self.permission_repo = PermissionRepository(self.async_session)
-        self.role_permission_repo = RolePermissionRepository(self.async_session)
-
+        if self.depth == 0:
+            self.async_session: AsyncSession = self.async_session_factory()
+        self.depth += 1
+        return self
 
     async def __aexit__(self, *args):
-        await self.rollback()
-        await self.async_session.close()
+        self.depth -= 1
+        if self.depth > 0:
+            return
+        try:
+            await self.rollback()
+            await self.async_session.close()
+        finally:
+            self.after_commit_hooks = []
+            for name in self.repositories:
+                self.__dict__.pop(name, None)
         
     async def commit(self):
+        if self.is_nested:
+            return
         await self.async_session.commit()
 
+        hooks, self.after_commit_hooks = self.after_commit_hooks, []
+        for hook in hooks:
+            try:
+                result = hook()
+                if isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"After commit hook failed: {e}")
+
+    def after_commit(self, hook: Callable[[], Any]):
+        """
+        Run the hook once the outermost block commits, dropped on rollback
+        """
+        if hook not in self.after_commit_hooks:
+            self.after_commit_hooks.append(hook)
+
     async def rollback(self):
-        await self.async_session.rollback()
\ No newline at end of file
+        if self.is_nested:
+            return
+        await self.async_session.rollback()
+
+
+class ReadOnlyUnitOfWork(SqlAlchemyUnitOfWork):
+    """
+    Reads from the replica while its lag is acceptable, from the primary otherwise
+    """
+
+    def __init__(self, role: str | None = None):
+        super().__init__(role)
+        self.primary_session_factory = self.async_session_factory
+        self.replica = get_replica(role or db.role)
+
+    async def __aenter__(self):
+        if self.depth == 0:
+            if self.replica is not None and await self.replica.is_fresh():
+                self.async_session_factory = self.replica.get_async_sessionmaker()
+            else:
+                self.async_session_factory = self.primary_session_factory
+        return await super().__aenter__()
+
+    async def commit(self):
+        raise RuntimeError("Read-only unit of work can't be committed")
@@ -30,12 +30,26 @@ class Config(BaseSettings):
 
     DB_URI: str = ""
     DB_ECHO: bool = False 
+    DB_POOL_ROLE: str = "api"
+    DB_POOL_PROFILES: dict[str, dict[str, int]] = {
+        "api": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 30},
+        "worker": {"pool_size": 4, "max_overflow": 4, "pool_timeout": 60},
+        "report": {"pool_size": 3, "max_overflow": 2, "pool_timeout": 120},
+    }
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
+    DB_REPLICA_URI: str = ""
+    DB_REPLICA_MAX_LAG: int = 30
+    DB_REPLICA_LAG_CHECK_INTERVAL: int = 10
 
     CELERY_BROKER_URL: str = ""
     CELERY_RESULT_BACKEND: str = ""
     REDIS_HOST: str = ""
     REDIS_PORT: int = 0
     REDIS_DB: int = 0 
+    REDIS_MAX_CONNECTIONS: int = 50
     FAST_API_CACHE: str = ""
 
     API_BASE_URL: str = ""
@@ -44,6 +58,33 @@ class Config(BaseSettings):
     API_USER_ID: str = ""
     API_CALLS_DELAY: float = 3
     API_CALLS_TIMEOUT_DELAY: float = 3
+    API_CALLS_RATE_LIMIT: float = 2
+    API_CALLS_CONCURRENCY: int = 5
+    API_CALLS_GLOBAL_RATE_LIMIT: int = 10
+    API_HISTORY_WINDOW: int = 100
+    API_HISTORY_RETRIES: int = 3
+    API_HTTP2: bool = True
+    API_HTTP_MAX_CONNECTIONS: int = 20
+    API_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    API_HTTP_KEEPALIVE_EXPIRY: float = 60
+    API_TOKEN_TTL: int = 3600
+    API_TOKEN_REFRESH_MARGIN: int = 120
+    API_TOKEN_LOCK_TIMEOUT: int = 60
+    API_RESPONSE_CACHE: bool = True
+    API_RESPONSE_CACHE_TTL: int = 60 * 60 * 24
+    DYNAMIC_ISSUES_OVERLAP_MINUTES: int = 10
+    DYNAMIC_ISSUES_BATCH_SIZE: int = 100
+    DYNAMIC_ISSUES_QUEUE_SIZE: int = 4
+    SYNC_PAGES_PER_TASK: int = 200
+    SYNC_CHECKPOINTS_TTL: int = 60 * 60 * 12
+    DB_BULK_LOAD_BATCH_SIZE: int = 10000
+    STATUSES_HISTORY_PARTITIONS_AHEAD: int = 3
+    MAPPERS_CACHE_TTL: int = 60 * 60
+    MAPPERS_REDIS_CACHE: bool = True
+    REFERENCE_CACHE_TTL: int = 60 * 10
+    REFERENCE_REDIS_CACHE: bool = True
+    ISSUES_RESPONSE_CACHE: bool = True
+    ISSUES_RESPONSE_CACHE_TTL: int = 60 * 60
 
 
     model_config = SettingsConfigDict(env_file=DOTENV, extra="ignore")
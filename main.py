@@ -5,6 +5,9 @@ from fastapi import FastAPI
 
 from app.api_v1 import router as router_v1
 from app.db import Base, db
+from app.services.history_status_service import HistoryStatusService
+from app.utils.redis_manager import close_redis_pool, init_redis_pool
+from app.utils.unit_of_work import SqlAlchemyUnitOfWork
 from config import config
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -13,7 +16,11 @@ from fastapi.middleware.cors import CORSMiddleware
 async def lifespan(app: FastAPI):
     async with db.engine.begin() as async_conn:
         await async_conn.run_sync(Base.metadata.create_all)
+    # create_all makes statuses_history partitioned, but without partitions nothing can be inserted
+    await HistoryStatusService(SqlAlchemyUnitOfWork()).create_partitions(config.STATUSES_HISTORY_PARTITIONS_AHEAD)
+    init_redis_pool()
     yield
+    await close_redis_pool()
 
 
 app = FastAPI(
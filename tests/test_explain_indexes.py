@@ -0,0 +1,149 @@
+"""
+EXPLAIN of the hot path queries has to go through the indexes of the hot path migration.
+Runs against DB_URI migrated to head, everything is rolled back afterwards:
+
+    python -m pytest tests/test_explain_indexes.py
+
+Sequential scans are turned off, so the plans don't depend on how much data the database has
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+import pytest
+from sqlalchemy import ARRAY, INTEGER, Select, TextClause, bindparam, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+
+from app.db.models.issue import Issue
+from app.db.models.issue_status_summary import IssueStatusSummary
+from app.repositories.issue_repository import IssueRepository
+from app.repositories.statuses_history_repository import REFRESH_STATUS_SUMMARY_SQL, StatusHistoryRepository
+from config import config
+
+
+START = datetime(2024, 9, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=29)
+
+FILTER_PARAMS = {
+    "start_date": START,
+    "end_date": END,
+    "transition_start_date": START,
+    "transition_end_date": END,
+    "transition_statuses": ["закрыта"],
+    "current_statuses": None,
+    "buildings_id": None,
+    "services_id": None,
+    "works_category_id": None,
+    "rooms_id": None,
+    "priorities_id": None,
+    "urgencies": None,
+}
+
+
+def explain_stmt(stmt: TextClause | Select) -> TextClause:
+    if isinstance(stmt, Select):
+        stmt = text(str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})))
+    return text(f"EXPLAIN (FORMAT JSON) {stmt.text}").bindparams(*stmt._bindparams.values())
+
+
+def plan_indexes(node: dict[str, Any]) -> set[str]:
+    indexes = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        indexes |= plan_indexes(child)
+    return indexes
+
+
+async def explain(conn: AsyncConnection, stmt: TextClause | Select, params: dict[str, Any] | None = None) -> set[str]:
+    """
+    Indexes used by the plan, indexes of the partitions are reported as their parent index
+    """
+    plan = (await conn.execute(explain_stmt(stmt), params or {})).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    indexes: set[str] = set()
+    for index in plan_indexes(plan[0]["Plan"]):
+        root = await conn.execute(
+            text("SELECT coalesce(pg_partition_root(CAST(:index AS regclass)), CAST(:index AS regclass))::text"),
+            {"index": index}
+        )
+        indexes.add(root.scalar_one())
+    return indexes
+
+
+def run(check: Callable[[AsyncConnection], Awaitable[None]]):
+    if config.DB_URI == "":
+        pytest.skip("DB_URI is not set")
+
+    async def main():
+        engine = create_async_engine(config.DB_URI)
+        try:
+            try:
+                conn = await engine.connect()
+            except (OSError, SQLAlchemyError) as e:
+                pytest.skip(f"Database is unavailable: {e}")
+
+            trans = await conn.begin()
+            try:
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                await StatusHistoryRepository(AsyncSession(bind=conn)).create_partitions(START.date(), 1)
+                await check(conn)
+            finally:
+                await trans.rollback()
+                await conn.close()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_filtered_issues_use_summary_and_transition_indexes():
+    async def check(conn: AsyncConnection):
+        stmt = IssueRepository(None).build_filtered_issues_sql(
+            "select ls_f.issue_id",
+            "LIMIT 50",
+            "ORDER BY ls_f.issue_id DESC",
+        )
+        indexes = await explain(conn, stmt, FILTER_PARAMS)
+        assert "ix_issue_status_summary_first_status_created_at" in indexes
+        assert "ix_statuses_history_issue_id_created_at" in indexes
+
+    run(check)
+
+
+def test_status_summary_refresh_uses_issue_external_id_index():
+    async def check(conn: AsyncConnection):
+        stmt = text(REFRESH_STATUS_SUMMARY_SQL).bindparams(bindparam("issue_ids", type_=ARRAY(INTEGER)))
+        indexes = await explain(conn, stmt, {"issue_ids": [1, 2, 3]})
+        assert "ix_statuses_history_issue_id_external_id" in indexes
+
+    run(check)
+
+
+def test_issues_by_service_and_status_use_indexes():
+    async def check(conn: AsyncConnection):
+        # as in IssueRepository.get_all_external_ids_with_included_statuses
+        stmt = (
+            select(Issue.external_id)
+            .join(IssueStatusSummary, IssueStatusSummary.issue_id == Issue.external_id)
+            .where(
+                Issue.service_id == 1,
+                IssueStatusSummary.last_status.in_(["принята", "в работе"])
+            )
+        )
+        indexes = await explain(conn, stmt)
+        assert indexes & {"ix_issues_service_id_created_at", "ix_issue_status_summary_last_status"}
+
+    run(check)
+
+
+def test_issues_created_in_range_use_created_at_index():
+    async def check(conn: AsyncConnection):
+        stmt = select(Issue.external_id).where(Issue.created_at.between(START, END))
+        indexes = await explain(conn, stmt)
+        assert "ix_issues_created_at" in indexes
+
+    run(check)
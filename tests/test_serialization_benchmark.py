@@ -0,0 +1,99 @@
+"""
+GET /issues serialization: FilteredIssue models with response_model validation
+against the rows encoded by pydantic-core. The timings are opt-in:
+
+    RUN_BENCHMARKS=1 python -m pytest -s tests/test_serialization_benchmark.py
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas.issue_schemas import FilteredIssue, FilteredIssuesGetSchema
+from app.services.issue_service import dump_filtered_issues, filtered_issue_from_row
+
+SIZES = [50, 1000, 10000]
+REPEATS = 5
+
+
+def make_rows(count: int) -> list[SimpleNamespace]:
+    created = datetime(2024, 9, 1, 8, 30)
+    return [
+        SimpleNamespace(
+            external_id=1_000_000 - i,
+            service_title="Эксплуатация зданий",
+            wc_title="Сантехнические работы",
+            iss_descr=f"Протечка в помещении {i}, требуется осмотр и замена смесителя",
+            last_status="закрыта" if i % 3 else "исполнена",
+            last_status_created=created + timedelta(days=2),
+            pred_status="исполнена",
+            pred_status_created=created + timedelta(days=1),
+            first_status_created=created,
+            finish_date_plane=created + timedelta(days=3),
+            rating=i % 5 or None,
+            building_title="Корпус A",
+            room_title=f"A{i % 900} (аудитория)",
+            work_place="Аудитория",
+            prior_title="Средний"
+        )
+        for i in range(count)
+    ]
+
+
+async def models_response(rows: list[SimpleNamespace]) -> bytes:
+    """
+    The former path: models per row, then response_model validation and the json encoder
+    """
+    res = FilteredIssuesGetSchema(
+        filtered_count=len(rows),
+        total_count=len(rows),
+        issues=[FilteredIssue.model_validate(filtered_issue_from_row(row)) for row in rows]
+    )
+    content = await serialize_response(
+        field=create_response_field("Response_get_filtered_issues", FilteredIssuesGetSchema),
+        response_content=res
+    )
+    return JSONResponse(content).body
+
+
+async def rows_response(rows: list[SimpleNamespace]) -> bytes:
+    return dump_filtered_issues(len(rows), len(rows), [filtered_issue_from_row(row) for row in rows])
+
+
+async def measure(build: Callable[[list[SimpleNamespace]], Awaitable[bytes]], rows: list[SimpleNamespace]) -> float:
+    timings: list[float] = []
+    for _ in range(REPEATS):
+        started = perf_counter()
+        await build(rows)
+        timings.append(perf_counter() - started)
+    return min(timings) * 1000
+
+
+def test_rows_response_matches_models_response():
+    rows = make_rows(SIZES[0])
+    assert json.loads(asyncio.run(models_response(rows))) == json.loads(asyncio.run(rows_response(rows)))
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to measure")
+def test_serialization_benchmark():
+    async def run() -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for size in SIZES:
+            rows = make_rows(size)
+            models_ms = await measure(models_response, rows)
+            rows_ms = await measure(rows_response, rows)
+            results.append({"rows": size, "models_ms": models_ms, "rows_ms": rows_ms})
+        return results
+
+    results = asyncio.run(run())
+    print(f"\n{'rows':>6} {'models, ms':>12} {'pydantic-core, ms':>18} {'speedup':>8}")
+    for res in results:
+        print(f"{res['rows']:>6} {res['models_ms']:>12.2f} {res['rows_ms']:>18.2f} {res['models_ms'] / res['rows_ms']:>7.1f}x")